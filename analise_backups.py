@@ -0,0 +1,119 @@
+"""Análise offline da evolução do backlog a partir dos backups e exportações arquivadas.
+
+Uso:
+    python analise_backups.py
+    python analise_backups.py --arquivos exportacoes/*.csv --processos 8 --comparar-serial
+"""
+import argparse
+import glob
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+PADRAO_BACKUPS = os.path.join("backups", "ordens_servico_*.csv")
+ARQUIVO_SAIDA = "serie_backlog.csv"
+TAMANHO_BLOCO = 50000
+
+
+def data_do_arquivo(caminho):
+    """Obtém a data do snapshot pelo nome (ordens_servico_AAAAMMDD_HHMMSS.csv) ou pela modificação do arquivo"""
+    encontrado = re.search(r"(\d{8}_\d{6})", os.path.basename(caminho))
+    if encontrado:
+        return datetime.strptime(encontrado.group(1), "%Y%m%d_%H%M%S")
+    return datetime.fromtimestamp(os.path.getmtime(caminho))
+
+
+def agregar_arquivo(caminho, tamanho_bloco=TAMANHO_BLOCO):
+    """Conta as OS abertas por status e tipo em um snapshot, lendo o CSV em blocos"""
+    por_status = {}
+    por_tipo = {}
+    abertas = 0
+    total = 0
+    leitor = pd.read_csv(caminho, usecols=lambda coluna: coluna in ("Status", "Tipo"), dtype=str,
+                         keep_default_na=False, chunksize=tamanho_bloco)
+    for bloco in leitor:
+        total += len(bloco)
+        if "Status" not in bloco.columns:
+            continue
+        bloco = bloco[bloco["Status"] != "Concluído"]
+        abertas += len(bloco)
+        for status, quantidade in bloco["Status"].value_counts().items():
+            por_status[status] = por_status.get(status, 0) + int(quantidade)
+        tipos = bloco["Tipo"].replace({"": "Sem tipo", "nan": "Sem tipo"}) if "Tipo" in bloco.columns else \
+            pd.Series("Sem tipo", index=bloco.index)
+        for tipo, quantidade in tipos.value_counts().items():
+            por_tipo[tipo] = por_tipo.get(tipo, 0) + int(quantidade)
+
+    return {
+        "Data": data_do_arquivo(caminho),
+        "Arquivo": os.path.basename(caminho),
+        "Total OS": total,
+        "Abertas": abertas,
+        **{f"Status - {status}": n for status, n in por_status.items()},
+        **{f"Tipo - {tipo}": n for tipo, n in por_tipo.items()}
+    }
+
+
+def analisar(arquivos, processos, tamanho_bloco=TAMANHO_BLOCO):
+    """Agrega todos os snapshots, distribuindo os arquivos entre os processos"""
+    if processos <= 1:
+        return [agregar_arquivo(caminho, tamanho_bloco) for caminho in arquivos]
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        return list(executor.map(agregar_arquivo, arquivos, [tamanho_bloco] * len(arquivos),
+                                 chunksize=max(1, len(arquivos) // (processos * 4))))
+
+
+def montar_serie(resultados):
+    """Junta os resultados por snapshot em uma série temporal ordenada por data"""
+    serie = pd.DataFrame(resultados)
+    if serie.empty:
+        return serie
+    serie = serie.sort_values("Data").reset_index(drop=True)
+    contagens = [coluna for coluna in serie.columns if coluna.startswith(("Status - ", "Tipo - "))]
+    serie[contagens] = serie[contagens].fillna(0).astype(int)
+    return serie[["Data", "Arquivo", "Total OS", "Abertas"] + sorted(contagens)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evolução do backlog de OS a partir dos backups")
+    parser.add_argument("--padrao", default=PADRAO_BACKUPS, help="Padrão glob dos backups")
+    parser.add_argument("--arquivos", nargs="*", default=[], help="Exportações arquivadas adicionais")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1, help="Número de processos")
+    parser.add_argument("--bloco", type=int, default=TAMANHO_BLOCO, help="Linhas por bloco na leitura do CSV")
+    parser.add_argument("--saida", default=ARQUIVO_SAIDA, help="CSV de saída com a série temporal")
+    parser.add_argument("--comparar-serial", action="store_true", help="Também executa em série e compara o tempo")
+    args = parser.parse_args()
+
+    arquivos = sorted(set(glob.glob(args.padrao)) | {a for padrao in args.arquivos for a in glob.glob(padrao)})
+    if not arquivos:
+        print("Nenhum arquivo encontrado para análise.")
+        return
+
+    tempo_serial = None
+    if args.comparar_serial:
+        # Lê todos os arquivos antes de medir, para que as duas execuções partam do mesmo cache de disco
+        for caminho in arquivos:
+            with open(caminho, 'rb') as f:
+                while f.read(1 << 20):
+                    pass
+        inicio = time.perf_counter()
+        montar_serie(analisar(arquivos, 1, args.bloco))
+        tempo_serial = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    serie = montar_serie(analisar(arquivos, args.processos, args.bloco))
+    tempo_paralelo = time.perf_counter() - inicio
+    serie.to_csv(args.saida, index=False, encoding='utf-8')
+
+    print(f"{len(arquivos)} arquivos analisados com {args.processos} processos em {tempo_paralelo:.2f}s")
+    print(f"Série temporal salva em {args.saida}")
+    if tempo_serial is not None:
+        print(f"Execução serial: {tempo_serial:.2f}s (ganho de {tempo_serial / tempo_paralelo:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
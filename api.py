@@ -0,0 +1,283 @@
+"""API HTTP (ASGI) sobre as ordens de serviço, para tablets, coletores e integrações.
+
+Usa a mesma camada de dados da interface Streamlit (dados.py). Execução:
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Rotas:
+    GET   /os          lista paginada; filtros: status, tipo, local, executante, urgente (sim/nao),
+                       pagina, por_pagina
+    GET   /os/{id}     uma OS
+    POST  /os          cria uma OS: {"descricao", "solicitante", "local", "urgente" (true/false)}
+    PATCH /os/{id}     altera {"status", "tipo", "executante1", "executante2", "observacoes"} (texto ou null);
+                       "responsavel" é gravado no log de eventos
+
+As respostas GET trazem ETag; se o cliente enviar o mesmo valor em If-None-Match,
+a resposta é 304 sem corpo.
+"""
+import asyncio
+import hashlib
+import json
+from urllib.parse import parse_qs
+
+from dados import (
+    STATUS_OPCOES, TIPOS_MANUTENCAO, ler_config, versao_dados, ler_csv,
+    criar_os_persistida, alterar_os_persistida, linha_para_dict, importar_historico_inicial
+)
+from notificacoes import criar_despachante, notificacao_os
+
+POR_PAGINA_PADRAO = 50
+POR_PAGINA_MAXIMO = 200
+TAMANHO_MAXIMO_CORPO = 1024 * 1024
+
+CAMPOS_ATUALIZACAO = {
+    "status": "Status",
+    "tipo": "Tipo",
+    "executante1": "Executante1",
+    "executante2": "Executante2",
+    "observacoes": "Observações"
+}
+
+
+class ErroRequisicao(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+
+class CacheOrdens:
+    """Mantém as OS em memória e só relê o CSV quando a versão do arquivo muda"""
+
+    def __init__(self):
+        self.versao = None
+        self.df = None
+        self.registros = []
+        self.por_id = {}
+
+    def atualizar(self, df, versao):
+        self.df = df
+        self.registros = [linha_para_dict(linha) for linha in df.to_dict('records')]
+        self.por_id = {registro["ID"]: registro for registro in self.registros}
+        self.versao = versao
+
+    async def obter(self):
+        versao = versao_dados()
+        if versao != self.versao:
+            self.atualizar(await asyncio.to_thread(ler_csv), versao)
+        return self
+
+
+cache = CacheOrdens()
+trava_escrita = asyncio.Lock()
+despachante = None
+
+
+def calcular_etag(*partes):
+    return '"' + hashlib.blake2b("|".join(partes).encode('utf-8'), digest_size=12).hexdigest() + '"'
+
+
+def filtrar(registros, parametros):
+    status = parametros.get("status")
+    tipo = parametros.get("tipo")
+    local = parametros.get("local", "").lower()
+    executante = parametros.get("executante")
+    urgente = parametros.get("urgente", "").lower()
+
+    resultado = registros
+    if status:
+        resultado = [r for r in resultado if r["Status"] == status]
+    if tipo:
+        resultado = [r for r in resultado if r["Tipo"] == tipo]
+    if local:
+        resultado = [r for r in resultado if local in r["Local"].lower()]
+    if executante:
+        resultado = [r for r in resultado if executante in (r["Executante1"], r["Executante2"])]
+    if urgente in ("sim", "nao", "não"):
+        resultado = [r for r in resultado if (r["Urgente"] == "Sim") == (urgente == "sim")]
+    return resultado
+
+
+def inteiro(parametros, nome, padrao, minimo, maximo):
+    try:
+        valor = int(parametros.get(nome, padrao))
+    except ValueError:
+        raise ErroRequisicao(400, f"Parâmetro '{nome}' deve ser um número inteiro")
+    return max(minimo, min(valor, maximo))
+
+
+async def listar(parametros, query_string, if_none_match):
+    ordens = await cache.obter()
+    etag = calcular_etag(ordens.versao, query_string)
+    if if_none_match == etag:
+        return 304, None, etag
+
+    pagina = inteiro(parametros, "pagina", 1, 1, 10 ** 9)
+    por_pagina = inteiro(parametros, "por_pagina", POR_PAGINA_PADRAO, 1, POR_PAGINA_MAXIMO)
+    resultado = filtrar(ordens.registros, parametros)
+    inicio = (pagina - 1) * por_pagina
+    return 200, {
+        "total": len(resultado),
+        "pagina": pagina,
+        "por_pagina": por_pagina,
+        "itens": resultado[inicio:inicio + por_pagina]
+    }, etag
+
+
+async def obter_os(os_id, if_none_match):
+    ordens = await cache.obter()
+    registro = ordens.por_id.get(os_id)
+    if registro is None:
+        raise ErroRequisicao(404, f"OS {os_id} não encontrada")
+    etag = calcular_etag(json.dumps(registro, sort_keys=True, ensure_ascii=False))
+    if if_none_match == etag:
+        return 304, None, etag
+    return 200, registro, etag
+
+
+def notificar(registro, titulo):
+    global despachante
+    if despachante is None:
+        despachante = criar_despachante(ler_config().get("notificacoes", {}))
+    despachante.notificar(notificacao_os(registro, titulo))
+
+
+def texto_obrigatorio(corpo, campo):
+    valor = corpo.get(campo)
+    if not isinstance(valor, str) or not valor.strip():
+        raise ErroRequisicao(422, f"Campo '{campo}' é obrigatório")
+    return valor.strip()
+
+
+def texto_opcional(corpo, campo):
+    """Texto sem espaços nas pontas; null vira texto vazio"""
+    valor = corpo.get(campo)
+    if valor is None:
+        return ""
+    if not isinstance(valor, str):
+        raise ErroRequisicao(422, f"Campo '{campo}' deve ser texto")
+    return valor.strip()
+
+
+async def criar_os(corpo):
+    descricao = texto_obrigatorio(corpo, "descricao")
+    solicitante = texto_obrigatorio(corpo, "solicitante")
+    local = texto_obrigatorio(corpo, "local")
+    urgente = corpo.get("urgente", False)
+    if not isinstance(urgente, bool):
+        raise ErroRequisicao(422, "Campo 'urgente' deve ser true ou false")
+
+    async with trava_escrita:
+        _, registro = await asyncio.to_thread(criar_os_persistida, descricao, solicitante, local, urgente)
+    registro = linha_para_dict(registro)
+
+    if urgente:
+        notificar(registro, "🚨 Nova OS urgente")
+    return 201, registro, None
+
+
+async def atualizar_os(os_id, corpo):
+    desconhecidos = set(corpo) - set(CAMPOS_ATUALIZACAO) - {"responsavel"}
+    if desconhecidos:
+        raise ErroRequisicao(422, f"Campos desconhecidos: {', '.join(sorted(desconhecidos))}")
+    campos = {CAMPOS_ATUALIZACAO[chave]: texto_opcional(corpo, chave) for chave in corpo if chave in CAMPOS_ATUALIZACAO}
+    responsavel = texto_opcional(corpo, "responsavel")
+    if "Status" in campos and campos["Status"] not in STATUS_OPCOES.values():
+        raise ErroRequisicao(422, f"Status inválido: {campos['Status']}")
+    if "Tipo" in campos and campos["Tipo"] not in ("", *TIPOS_MANUTENCAO.values()):
+        raise ErroRequisicao(422, f"Tipo inválido: {campos['Tipo']}")
+
+    async with trava_escrita:
+        try:
+            _, alteracoes = await asyncio.to_thread(alterar_os_persistida, os_id, campos, responsavel)
+        except KeyError:
+            raise ErroRequisicao(404, f"OS {os_id} não encontrada")
+        except ValueError as e:
+            raise ErroRequisicao(422, str(e))
+    # Relê pelo cache: outro processo pode ter gravado logo depois desta alteração
+    registro = (await cache.obter()).por_id[os_id]
+
+    if registro["Urgente"] == "Sim" and "Status" in alteracoes:
+        notificar(registro, f"OS urgente {registro['Status'].lower()}")
+    return 200, registro, None
+
+
+async def ler_corpo(receive):
+    partes = []
+    tamanho = 0
+    while True:
+        mensagem = await receive()
+        parte = mensagem.get("body", b"")
+        tamanho += len(parte)
+        if tamanho > TAMANHO_MAXIMO_CORPO:
+            raise ErroRequisicao(413, "Corpo da requisição muito grande")
+        partes.append(parte)
+        if not mensagem.get("more_body", False):
+            break
+    try:
+        corpo = json.loads(b"".join(partes) or b"{}")
+    except ValueError:
+        raise ErroRequisicao(400, "Corpo da requisição deve ser JSON")
+    if not isinstance(corpo, dict):
+        raise ErroRequisicao(400, "Corpo da requisição deve ser um objeto JSON")
+    return corpo
+
+
+async def responder(send, status, corpo, etag=None):
+    cabecalhos = [(b"content-type", b"application/json; charset=utf-8")]
+    if etag:
+        cabecalhos.append((b"etag", etag.encode()))
+    dados = b"" if corpo is None else json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+    cabecalhos.append((b"content-length", str(len(dados)).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": cabecalhos})
+    await send({"type": "http.response.body", "body": dados})
+
+
+async def rotear(scope, receive):
+    metodo = scope["method"]
+    partes = [parte for parte in scope["path"].split("/") if parte]
+    if not partes or partes[0] != "os" or len(partes) > 2:
+        raise ErroRequisicao(404, "Rota não encontrada")
+
+    cabecalhos = dict(scope["headers"])
+    if_none_match = cabecalhos.get(b"if-none-match", b"").decode('latin-1') or None
+
+    if len(partes) == 1:
+        if metodo == "GET":
+            query_string = scope["query_string"].decode('latin-1')
+            parametros = {chave: valores[-1] for chave, valores in parse_qs(query_string).items()}
+            return await listar(parametros, query_string, if_none_match)
+        if metodo == "POST":
+            return await criar_os(await ler_corpo(receive))
+        raise ErroRequisicao(405, "Método não permitido")
+
+    try:
+        os_id = int(partes[1])
+    except ValueError:
+        raise ErroRequisicao(404, "Rota não encontrada")
+    if metodo == "GET":
+        return await obter_os(os_id, if_none_match)
+    if metodo == "PATCH":
+        return await atualizar_os(os_id, await ler_corpo(receive))
+    raise ErroRequisicao(405, "Método não permitido")
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            mensagem = await receive()
+            if mensagem["type"] == "lifespan.startup":
+                await asyncio.to_thread(importar_historico_inicial)
+                await send({"type": "lifespan.startup.complete"})
+            elif mensagem["type"] == "lifespan.shutdown":
+                if despachante is not None:
+                    await asyncio.to_thread(despachante.parar, 30)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    try:
+        status, corpo, etag = await rotear(scope, receive)
+    except ErroRequisicao as e:
+        status, corpo, etag = e.status, {"erro": e.mensagem}, None
+    await responder(send, status, corpo, etag)
@@ -2,9 +2,8 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
-import shutil
 import time
 import glob
 import base64
@@ -23,6 +22,17 @@ st.set_page_config(
     layout="wide"
 )
 
+from dados import (
+    LOCAL_FILENAME, BACKUP_DIR, MAX_BACKUPS, CONFIG_FILE, EVENTOS_FILE, COLUNAS_OS, SCHEMA_VERSAO,
+    TIPOS_MANUTENCAO, STATUS_OPCOES, ler_config, versao_dados, fazer_backup, limpar_backups_antigos, carregar_ultimo_backup,
+    ler_csv, importar_csv, isolar_arquivo, ler_meta, criar_os_persistida, alterar_os_persistida, agora_local,
+    carregar_indice_executantes, carregar_executantes, salvar_executantes,
+    sugerir_executantes, buscar_duplicatas, detectar_duplicatas_historicas, linha_para_dict,
+    reconstruir_estado, linha_do_tempo, tempo_por_status, campos_da_os, importar_historico_inicial
+)
+from consultas import CamadaConsultas, Instantaneo
+from notificacoes import criar_despachante, notificacao_os
+
 # Tenta importar o PyGithub com fallback
 try:
     from github import Github
@@ -32,59 +42,37 @@ except ImportError:
     st.warning("Funcionalidade do GitHub não disponível (PyGithub não instalado)")
 
 # Constantes
-LOCAL_FILENAME = "ordens_servico.csv"
-BACKUP_DIR = "backups"
-MAX_BACKUPS = 10
 SENHA_SUPERVISAO = "king@2025"
-CONFIG_FILE = "config.json"
-
-# Executantes pré-definidos
-EXECUTANTES_PREDEFINIDOS = ["Guilherme", "Ismael"]
 
 # Variáveis globais para configuração do GitHub
 GITHUB_REPO = None
 GITHUB_FILEPATH = None
 GITHUB_TOKEN = None
 
-TIPOS_MANUTENCAO = {
-    1: "Elétrica",
-    2: "Mecânica",
-    3: "Refrigeração",
-    4: "Hidráulica",
-    5: "Civil",
-    6: "Instalação"
-}
-
-STATUS_OPCOES = {
-    1: "Pendente",
-    2: "Pausado",
-    3: "Em execução",
-    4: "Concluído"
-}
+# Configuração das notificações de OS urgentes (seção "notificacoes" do config.json)
+NOTIFICACOES_CONFIG = {}
 
 def carregar_config():
     """Carrega as configurações do GitHub do arquivo config.json"""
-    global GITHUB_REPO, GITHUB_FILEPATH, GITHUB_TOKEN
+    global GITHUB_REPO, GITHUB_FILEPATH, GITHUB_TOKEN, NOTIFICACOES_CONFIG
     try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE) as f:
-                config = json.load(f)
-                GITHUB_REPO = config.get('github_repo')
-                GITHUB_FILEPATH = config.get('github_filepath')
-                GITHUB_TOKEN = config.get('github_token')
+        config = ler_config()
+        GITHUB_REPO = config.get('github_repo')
+        GITHUB_FILEPATH = config.get('github_filepath')
+        GITHUB_TOKEN = config.get('github_token')
+        NOTIFICACOES_CONFIG = config.get('notificacoes', {})
     except Exception as e:
         st.error(f"Erro ao carregar configurações: {str(e)}")
 
-def converter_arquivo_antigo(df):
-    """Converte o formato antigo (com 'Executante') para o novo (com 'Executante1' e 'Executante2')"""
-    if 'Executante' in df.columns and 'Executante1' not in df.columns:
-        df['Executante1'] = df['Executante']
-        df['Executante2'] = ""
-        df['Observações'] = ""  # Adiciona coluna de observações se não existir
-        df.drop('Executante', axis=1, inplace=True)
-    if 'Observações' not in df.columns:  # Garante que a coluna existe
-        df['Observações'] = ""
-    return df
+@st.cache_resource
+def obter_despachante():
+    """Despachante de notificações compartilhado entre sessões (uma thread por processo)"""
+    carregar_config()
+    return criar_despachante(NOTIFICACOES_CONFIG)
+
+def notificar_os_urgente(registro, titulo):
+    """Enfileira a notificação de uma OS urgente sem bloquear a requisição"""
+    obter_despachante().notificar(notificacao_os(registro, titulo))
 
 def inicializar_arquivos():
     """Garante que todos os arquivos necessários existam e estejam válidos"""
@@ -97,10 +85,11 @@ def inicializar_arquivos():
         if usar_github:
             baixar_do_github()
         else:
-            df = pd.DataFrame(columns=["ID", "Descrição", "Data", "Hora Abertura", "Solicitante", "Local", 
-                                     "Tipo", "Status", "Data Conclusão", "Hora Conclusão", "Executante1", "Executante2", "Urgente", "Observações"])
+            df = pd.DataFrame(columns=COLUNAS_OS)
             df.to_csv(LOCAL_FILENAME, index=False)
 
+    importar_historico_inicial(carregar_csv)
+
 def baixar_do_github():
     """Baixa o arquivo do GitHub se estiver mais atualizado"""
     if not GITHUB_AVAILABLE:
@@ -114,8 +103,15 @@ def baixar_do_github():
         contents = repo.get_contents(GITHUB_FILEPATH)
         file_content = contents.decoded_content.decode('utf-8')
         
-        with open(LOCAL_FILENAME, 'w', encoding='utf-8') as f:
+        caminho_temporario = os.path.join(BACKUP_DIR, f"github_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        with open(caminho_temporario, 'w', encoding='utf-8') as f:
             f.write(file_content)
+        try:
+            # Sem log de eventos ainda, o histórico é importado por inicializar_arquivos
+            restauracao = {"github": GITHUB_FILEPATH} if os.path.exists(EVENTOS_FILE) else None
+            importar_csv(caminho_temporario, restauracao)
+        finally:
+            os.remove(caminho_temporario)
         return True
     except Exception as e:
         st.error(f"Erro ao baixar do GitHub: {str(e)}")
@@ -145,98 +141,60 @@ def enviar_para_github():
         st.error(f"Erro ao enviar para GitHub: {str(e)}")
         return False
 
-def fazer_backup():
-    """Cria um backup dos dados atuais"""
-    if os.path.exists(LOCAL_FILENAME) and os.path.getsize(LOCAL_FILENAME) > 0:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_name = os.path.join(BACKUP_DIR, f"ordens_servico_{timestamp}.csv")
-        shutil.copy(LOCAL_FILENAME, backup_name)
-        limpar_backups_antigos(MAX_BACKUPS)
-        return backup_name
-    return None
-
-def limpar_backups_antigos(max_backups):
-    """Remove backups antigos mantendo apenas os mais recentes"""
-    backups = sorted(glob.glob(os.path.join(BACKUP_DIR, "ordens_servico_*.csv")))
-    while len(backups) > max_backups:
-        try:
-            os.remove(backups[0])
-            backups.pop(0)
-        except:
-            continue
-
-def carregar_ultimo_backup():
-    """Retorna o caminho do backup mais recente"""
-    backups = sorted(glob.glob(os.path.join(BACKUP_DIR, "ordens_servico_*.csv")))
-    if backups:
-        return backups[-1]
-    return None
-
 def carregar_csv():
     """Carrega os dados do CSV local"""
     try:
         if not os.path.exists(LOCAL_FILENAME):
             inicializar_arquivos()
-            
-        df = pd.read_csv(LOCAL_FILENAME)
-        df = converter_arquivo_antigo(df)
-        
-        colunas_necessarias = ["ID", "Descrição", "Data", "Hora Abertura", "Solicitante", "Local", 
-                             "Tipo", "Status", "Data Conclusão", "Hora Conclusão", "Executante1", "Executante2", "Urgente", "Observações"]
-        
-        for coluna in colunas_necessarias:
-            if coluna not in df.columns:
-                df[coluna] = ""
-        
-        df["Executante1"] = df["Executante1"].astype(str)
-        df["Executante2"] = df["Executante2"].astype(str)
-        df["Data Conclusão"] = df["Data Conclusão"].astype(str)
-        df["Hora Conclusão"] = df["Hora Conclusão"].astype(str)
-        df["Urgente"] = df["Urgente"].astype(str)
-        df["Observações"] = df["Observações"].astype(str)
-        
-        return df
+
+        return ler_csv()
     except Exception as e:
         st.error(f"Erro ao ler arquivo local: {str(e)}")
         backup = carregar_ultimo_backup()
         if backup:
             try:
-                df = pd.read_csv(backup)
-                df = converter_arquivo_antigo(df)
-                df.to_csv(LOCAL_FILENAME, index=False)
+                # O arquivo pode nem existir (ex.: download do GitHub falhou); só isola se houver o que preservar
+                arquivo_isolado = isolar_arquivo(LOCAL_FILENAME) if os.path.exists(LOCAL_FILENAME) else None
+                df, resumo = importar_csv(backup, {"backup": os.path.basename(backup)})
+                st.warning(f"Dados restaurados do backup {os.path.basename(backup)} "
+                           f"({resumo['validas']} OS válidas, {resumo['rejeitadas']} rejeitadas)."
+                           + (f" O arquivo com erro foi preservado em {arquivo_isolado}." if arquivo_isolado else ""))
                 return df
             except Exception as e:
                 st.error(f"Erro ao carregar backup: {str(e)}")
-        
-        return pd.DataFrame(columns=["ID", "Descrição", "Data", "Hora Abertura", "Solicitante", "Local", 
-                                   "Tipo", "Status", "Data Conclusão", "Hora Conclusão", "Executante1", "Executante2", "Urgente", "Observações"])
 
-def salvar_csv(df):
-    """Salva o DataFrame no arquivo CSV local e faz backup"""
+        return pd.DataFrame(columns=COLUNAS_OS)
+
+def executar_gravacao(operacao, *args):
+    """Executa uma gravação da camada de dados (com backup e log de eventos) e sincroniza com o GitHub.
+
+    Retorna o resultado da operação, ou None se ela falhar.
+    """
     try:
-        colunas_necessarias = ["ID", "Descrição", "Data", "Hora Abertura", "Solicitante", "Local", 
-                             "Tipo", "Status", "Data Conclusão", "Hora Conclusão", "Executante1", "Executante2", "Urgente", "Observações"]
-        
-        for coluna in colunas_necessarias:
-            if coluna not in df.columns:
-                df[coluna] = ""
-        
-        df["Executante1"] = df["Executante1"].astype(str)
-        df["Executante2"] = df["Executante2"].astype(str)
-        df["Data Conclusão"] = df["Data Conclusão"].astype(str)
-        df["Hora Conclusão"] = df["Hora Conclusão"].astype(str)
-        df["Urgente"] = df["Urgente"].astype(str)
-        df["Observações"] = df["Observações"].astype(str)
-        
-        df.to_csv(LOCAL_FILENAME, index=False, encoding='utf-8')
-        fazer_backup()
-        
+        resultado = operacao(*args)
+
         if GITHUB_AVAILABLE and GITHUB_REPO and GITHUB_FILEPATH and GITHUB_TOKEN:
             enviar_para_github()
-        return True
+        return resultado
     except Exception as e:
         st.error(f"Erro ao salvar dados: {str(e)}")
-        return False
+        return None
+
+@st.cache_resource
+def obter_consultas():
+    """Camada de consultas compartilhada entre sessões (cache de filtros e máscaras)"""
+    return CamadaConsultas()
+
+def carregar_consultas():
+    """Retorna o instantâneo atual das consultas, relendo o CSV somente se ele mudou desde a última carga.
+
+    Se a leitura falhar, nada é guardado na camada compartilhada: a página usa o resultado de
+    carregar_csv (erro e restauração do backup) e a próxima execução tenta de novo.
+    """
+    try:
+        return obter_consultas().sincronizar(versao_dados, ler_csv)
+    except Exception:
+        return Instantaneo(carregar_csv(), None)
 
 def pagina_inicial():
     # Carrega a imagem
@@ -290,6 +248,7 @@ def pagina_inicial():
     **Funcionalidades disponíveis:**
     - 📝 **Cadastro** de novas ordens de serviço
     - 📋 **Listagem** completa de OS cadastradas
+    - 👷 **Fila** de OS abertas por executante
     - 🔍 **Busca** avançada por diversos critérios
     - 📊 **Dashboard** com análises gráficas
     - 🔐 **Supervisão** (área restrita)
@@ -308,6 +267,17 @@ def pagina_inicial():
     else:
         st.warning("⚠️ Funcionalidade GitHub não disponível (PyGithub não instalado)")
 
+def registrar_os(descricao, solicitante, local, urgente):
+    """Cria e salva uma nova OS"""
+    resultado = executar_gravacao(criar_os_persistida, descricao, solicitante, local, urgente)
+    if resultado is not None:
+        _, registro = resultado
+        if urgente:
+            notificar_os_urgente(linha_para_dict(registro), "🚨 Nova OS urgente")
+        st.success("Ordem cadastrada com sucesso! Backup automático realizado.")
+        time.sleep(1)
+        st.rerun()
+
 def cadastrar_os():
     st.header("📝 Cadastrar Nova Ordem de Serviço")
     with st.form("cadastro_os_form", clear_on_submit=True):
@@ -322,40 +292,43 @@ def cadastrar_os():
                 st.error("Preencha todos os campos obrigatórios (*)")
             else:
                 df = carregar_csv()
-                novo_id = int(df["ID"].max()) + 1 if not df.empty and not pd.isna(df["ID"].max()) else 1
-                data_hora_utc = datetime.utcnow()
-                data_hora_local = data_hora_utc - timedelta(hours=3)
-                data_abertura = data_hora_local.strftime("%d/%m/%Y")
-                hora_abertura = data_hora_local.strftime("%H:%M")
-                
-                nova_os = pd.DataFrame([{
-                    "ID": novo_id,
-                    "Descrição": descricao,
-                    "Data": data_abertura,
-                    "Hora Abertura": hora_abertura,
-                    "Solicitante": solicitante,
-                    "Local": local,
-                    "Tipo": "",
-                    "Status": "Pendente",
-                    "Data Conclusão": "",
-                    "Hora Conclusão": "",
-                    "Executante1": "",
-                    "Executante2": "",
-                    "Urgente": "Sim" if urgente else "Não",
-                    "Observações": ""
-                }])
-
-                df = pd.concat([df, nova_os], ignore_index=True)
-                if salvar_csv(df):
-                    st.success("Ordem cadastrada com sucesso! Backup automático realizado.")
-                    time.sleep(1)
-                    st.rerun()
+                duplicatas = buscar_duplicatas(df, descricao, local)
+                if duplicatas:
+                    # Guarda a OS até o usuário confirmar que não é duplicada
+                    st.session_state.os_pendente = {
+                        "descricao": descricao,
+                        "solicitante": solicitante,
+                        "local": local,
+                        "urgente": urgente,
+                        "duplicatas": duplicatas
+                    }
+                else:
+                    registrar_os(descricao, solicitante, local, urgente)
+
+    os_pendente = st.session_state.get('os_pendente')
+    if os_pendente:
+        st.warning(f"⚠️ Já existem OS abertas semelhantes em '{os_pendente['local']}':")
+        for duplicata in os_pendente["duplicatas"]:
+            st.write(f"- ID {duplicata['ID']} - {duplicata['Descrição']} "
+                     f"({duplicata['Similaridade']:.0%} semelhante)")
+        st.write(f"**Nova OS:** {os_pendente['descricao']}")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("✅ Cadastrar mesmo assim"):
+                st.session_state.os_pendente = None
+                registrar_os(os_pendente["descricao"], os_pendente["solicitante"],
+                             os_pendente["local"], os_pendente["urgente"])
+        with col2:
+            if st.button("❌ Cancelar cadastro"):
+                st.session_state.os_pendente = None
+                st.rerun()
 
 def listar_os():
     st.header("📋 Listagem Completa de OS")
-    df = carregar_csv()
+    consultas = carregar_consultas()
 
-    if df.empty:
+    if consultas.df.empty:
         st.warning("Nenhuma ordem de serviço cadastrada ainda.")
     else:
         with st.expander("Filtrar OS"):
@@ -365,18 +338,41 @@ def listar_os():
             with col2:
                 filtro_tipo = st.selectbox("Tipo de Manutenção", ["Todos"] + list(TIPOS_MANUTENCAO.values()))
 
+        filtros = []
         if filtro_status != "Todos":
-            df = df[df["Status"] == filtro_status]
+            filtros.append(("Status", "igual", filtro_status))
         if filtro_tipo != "Todos":
-            df = df[df["Tipo"] == filtro_tipo]
+            filtros.append(("Tipo", "igual", filtro_tipo))
+
+        st.dataframe(consultas.consultar(filtros), use_container_width=True)
+
+def minha_fila():
+    st.header("👷 Minha Fila")
+    executantes = carregar_executantes()
+    if not executantes:
+        st.warning("Nenhum executante cadastrado.")
+        return
+
+    executante = st.selectbox("Executante", executantes)
+    indice = carregar_indice_executantes()
+    entrada = indice.get(executante, {"abertas": [], "concluidas": []})
+
+    col1, col2 = st.columns(2)
+    col1.metric("OS abertas", len(entrada["abertas"]))
+    col2.metric("OS concluídas", len(entrada["concluidas"]))
+
+    if not entrada["abertas"]:
+        st.success("Nenhuma OS aberta para este executante.")
+        return
 
-        st.dataframe(df, use_container_width=True)
+    df = carregar_csv()
+    st.dataframe(df[df["ID"].isin(entrada["abertas"])], use_container_width=True)
 
 def buscar_os():
     st.header("🔍 Busca Avançada")
-    df = carregar_csv()
+    consultas = carregar_consultas()
 
-    if df.empty:
+    if consultas.df.empty:
         st.warning("Nenhuma OS cadastrada para busca.")
         return
 
@@ -388,16 +384,16 @@ def buscar_os():
         with col2:
             if criterio == "ID":
                 busca = st.number_input("Digite o ID da OS", min_value=1)
-                resultado = df[df["ID"] == busca]
+                resultado = consultas.consultar([("ID", "igual", busca)])
             elif criterio == "Status":
                 busca = st.selectbox("Selecione o status", list(STATUS_OPCOES.values()))
-                resultado = df[df["Status"] == busca]
+                resultado = consultas.consultar([("Status", "igual", busca)])
             elif criterio == "Tipo":
                 busca = st.selectbox("Selecione o tipo", list(TIPOS_MANUTENCAO.values()))
-                resultado = df[df["Tipo"] == busca]
+                resultado = consultas.consultar([("Tipo", "igual", busca)])
             else:
                 busca = st.text_input(f"Digite o {criterio.lower()}")
-                resultado = df[df[criterio].astype(str).str.contains(busca, case=False)]
+                resultado = consultas.consultar([(criterio, "contem", busca)])
 
     if not resultado.empty:
         st.success(f"Encontradas {len(resultado)} OS:")
@@ -407,7 +403,8 @@ def buscar_os():
 
 def dashboard():
     st.header("📊 Dashboard Analítico")
-    df = carregar_csv()
+    consultas = carregar_consultas()
+    df = consultas.df
 
     if df.empty:
         st.warning("Nenhuma OS cadastrada para análise.")
@@ -417,7 +414,7 @@ def dashboard():
 
     with tab1:
         st.subheader("Distribuição por Tipo de Manutenção")
-        tipo_counts = df["Tipo"].value_counts()
+        tipo_counts = df.loc[df["Tipo"] != "", "Tipo"].value_counts()
         
         if not tipo_counts.empty:
             fig, ax = plt.subplots(figsize=(3, 2))
@@ -457,16 +454,8 @@ def dashboard():
         with col1:
             periodo = st.selectbox("Período", ["Todos", "Por Mês/Ano"])
         
-        df_filtrado = df.copy()
-        
         if periodo == "Por Mês/Ano":
             with col2:
-                # Converter a coluna Data Conclusão para datetime
-                df_filtrado['Data Conclusão'] = pd.to_datetime(df_filtrado['Data Conclusão'], dayfirst=True, errors='coerce')
-                
-                # Filtrar apenas OS concluídas
-                df_filtrado = df_filtrado[df_filtrado['Status'] == 'Concluído']
-                
                 # Criar listas de meses e anos disponíveis
                 meses = list(range(1, 13))
                 anos = list(range(2024, 2031))  # De 2024 até 2030
@@ -474,14 +463,14 @@ def dashboard():
                 mes_selecionado = st.selectbox("Mês", meses, format_func=lambda x: f"{x:02d}")
                 ano_selecionado = st.selectbox("Ano", anos)
                 
-                # Filtrar os dados pela data de conclusão
-                df_filtrado = df_filtrado[
-                    (df_filtrado['Data Conclusão'].dt.month == mes_selecionado) & 
-                    (df_filtrado['Data Conclusão'].dt.year == ano_selecionado)
-                ]
+                # Filtrar as OS concluídas pela data de conclusão
+                df_filtrado = consultas.consultar([
+                    ("Status", "igual", "Concluído"),
+                    ("Data Conclusão", "mes_ano", (mes_selecionado, ano_selecionado))
+                ])
         else:
             # Filtrar apenas OS concluídas quando selecionado "Todos"
-            df_filtrado = df_filtrado[df_filtrado['Status'] == 'Concluído']
+            df_filtrado = consultas.consultar([("Status", "igual", "Concluído")])
         
         # Concatenar executantes e filtrar valores inválidos
         executantes = pd.concat([df_filtrado["Executante1"], df_filtrado["Executante2"]])
@@ -563,6 +552,10 @@ def pagina_supervisao():
         "Selecione a função de supervisão:",
         [
             "🔄 Atualizar OS",
+            "👷 Gerenciar Executantes",
+            "🔁 Verificar Duplicidades",
+            "🕓 Histórico de OS",
+            "🧪 Qualidade dos Dados",
             "💾 Gerenciar Backups",
             "⚙️ Configurar GitHub"
         ]
@@ -570,6 +563,14 @@ def pagina_supervisao():
     
     if opcao_supervisao == "🔄 Atualizar OS":
         atualizar_os()
+    elif opcao_supervisao == "👷 Gerenciar Executantes":
+        gerenciar_executantes()
+    elif opcao_supervisao == "🔁 Verificar Duplicidades":
+        verificar_duplicidades()
+    elif opcao_supervisao == "🕓 Histórico de OS":
+        historico_os()
+    elif opcao_supervisao == "🧪 Qualidade dos Dados":
+        qualidade_dados()
     elif opcao_supervisao == "💾 Gerenciar Backups":
         gerenciar_backups()
     elif opcao_supervisao == "⚙️ Configurar GitHub":
@@ -587,6 +588,12 @@ def atualizar_os():
     os_id = st.selectbox("Selecione a OS", nao_concluidas["ID"])
     os_data = df[df["ID"] == os_id].iloc[0]
 
+    executantes = carregar_executantes()
+    indice = carregar_indice_executantes()
+    sugestoes = sugerir_executantes(indice, executantes)[:3]
+    st.caption("Sugestão por carga de trabalho: " + ", ".join(
+        f"{nome} ({len(indice.get(nome, {}).get('abertas', []))} abertas)" for nome in sugestoes))
+
     with st.form("atualizar_form"):
         st.write(f"**Descrição:** {os_data['Descrição']}")
         st.write(f"**Solicitante:** {os_data['Solicitante']}")
@@ -607,55 +614,46 @@ def atualizar_os():
                 index=list(STATUS_OPCOES.values()).index(os_data["Status"])
             )
 
+            # Executantes removidos do cadastro continuam como opção para não reatribuir a OS sem querer
             executante1_atual = str(os_data["Executante1"]) if pd.notna(os_data["Executante1"]) else ""
+            opcoes_executante1 = executantes + [nome for nome in [executante1_atual] if nome and nome not in executantes]
             try:
-                index_executante1 = EXECUTANTES_PREDEFINIDOS.index(executante1_atual)
+                index_executante1 = opcoes_executante1.index(executante1_atual)
             except ValueError:
                 index_executante1 = 0
 
             executante1 = st.selectbox(
                 "Executante Principal*",
-                EXECUTANTES_PREDEFINIDOS,
+                opcoes_executante1,
                 index=index_executante1
             )
 
         with col2:
             executante2_atual = str(os_data["Executante2"]) if pd.notna(os_data["Executante2"]) else ""
-            try:
-                index_executante2 = EXECUTANTES_PREDEFINIDOS.index(executante2_atual) + 1
-            except ValueError:
-                index_executante2 = 0
+            opcoes_executante2 = [""] + executantes + [nome for nome in [executante2_atual] if nome and nome not in executantes]
 
             executante2 = st.selectbox(
                 "Executante Secundário (opcional)",
-                [""] + EXECUTANTES_PREDEFINIDOS,
-                index=index_executante2
+                opcoes_executante2,
+                index=opcoes_executante2.index(executante2_atual)
             )
 
             if novo_status == "Concluído":
-                data_hora_utc = datetime.utcnow()
-                data_hora_local = data_hora_utc - timedelta(hours=3)
-                data_atual = data_hora_local.strftime("%d/%m/%Y")
-                hora_atual = data_hora_local.strftime("%H:%M")
-                
-                data_conclusao = data_atual
-                hora_conclusao = hora_atual
-                
+                # Apenas exibição: aplicar_alteracoes preenche a data e a hora ao concluir
+                data_hora_local = agora_local()
                 st.text_input(
                     "Data de conclusão",
-                    value=data_atual,
+                    value=data_hora_local.strftime("%d/%m/%Y"),
                     disabled=True
                 )
                 st.text_input(
                     "Hora de conclusão",
-                    value=hora_atual,
+                    value=data_hora_local.strftime("%H:%M"),
                     disabled=True
                 )
-            else:
-                data_conclusao = ""
-                hora_conclusao = ""
 
         observacoes = st.text_area("Observações", value=os_data.get("Observações", ""))
+        responsavel = st.text_input("Responsável pela alteração")
 
         submitted = st.form_submit_button("Atualizar OS")
 
@@ -663,24 +661,141 @@ def atualizar_os():
             if novo_status in ["Em execução", "Concluído"] and not executante1:
                 st.error("Selecione pelo menos um executante principal para este status!")
             else:
-                df.loc[df["ID"] == os_id, "Status"] = novo_status
-                df.loc[df["ID"] == os_id, "Executante1"] = executante1
-                df.loc[df["ID"] == os_id, "Executante2"] = executante2 if executante2 != "" else ""
-                df.loc[df["ID"] == os_id, "Tipo"] = tipo
-                df.loc[df["ID"] == os_id, "Observações"] = observacoes
-                
-                if novo_status == "Concluído":
-                    df.loc[df["ID"] == os_id, "Data Conclusão"] = data_conclusao
-                    df.loc[df["ID"] == os_id, "Hora Conclusão"] = hora_conclusao
-                else:
-                    df.loc[df["ID"] == os_id, "Data Conclusão"] = ""
-                    df.loc[df["ID"] == os_id, "Hora Conclusão"] = ""
-                
-                if salvar_csv(df):
+                campos = {
+                    "Status": novo_status,
+                    "Executante1": executante1,
+                    "Executante2": executante2,
+                    "Tipo": tipo,
+                    "Observações": observacoes
+                }
+                resultado = executar_gravacao(alterar_os_persistida, os_id, campos, responsavel)
+
+                if resultado is not None:
+                    df, alteracoes = resultado
+                    atual = linha_para_dict(df[df["ID"] == os_id].iloc[0])
+                    if atual["Urgente"] == "Sim" and "Status" in alteracoes:
+                        notificar_os_urgente(atual, f"OS urgente {novo_status.lower()}")
                     st.success("OS atualizada com sucesso! Backup automático realizado.")
                     time.sleep(1)
                     st.rerun()
 
+def gerenciar_executantes():
+    st.header("👷 Gerenciar Executantes")
+    executantes = carregar_executantes()
+    indice = carregar_indice_executantes()
+
+    carga = pd.DataFrame([{
+        "Executante": nome,
+        "OS abertas": len(indice.get(nome, {}).get("abertas", [])),
+        "OS concluídas": len(indice.get(nome, {}).get("concluidas", []))
+    } for nome in executantes])
+    st.dataframe(carga, use_container_width=True)
+
+    with st.form("executantes_form", clear_on_submit=True):
+        novo = st.text_input("Adicionar executante")
+        remover = st.multiselect("Remover executantes", executantes)
+        submitted = st.form_submit_button("Salvar Cadastro")
+
+        if submitted:
+            nomes = [nome for nome in executantes if nome not in remover]
+            if novo.strip() and novo.strip() not in nomes:
+                nomes.append(novo.strip())
+            salvar_executantes(nomes)
+            st.success("Cadastro de executantes atualizado!")
+            time.sleep(1)
+            st.rerun()
+
+def verificar_duplicidades():
+    st.header("🔁 Verificar Duplicidades")
+    st.write("Procura no histórico pares de OS com descrição semelhante no mesmo local.")
+
+    if st.button("🔎 Analisar Histórico"):
+        try:
+            pares = detectar_duplicatas_historicas()
+        except Exception as e:
+            st.error(f"Erro ao analisar histórico: {str(e)}")
+            return
+        if pares.empty:
+            st.success("Nenhuma duplicidade encontrada.")
+        else:
+            st.warning(f"Encontrados {len(pares)} pares de OS possivelmente duplicadas:")
+            st.dataframe(pares, use_container_width=True)
+
+def historico_os():
+    st.header("🕓 Histórico de OS")
+    tab1, tab2 = st.tabs(["📜 Linha do Tempo", "⏪ Estado em uma Data"])
+
+    with tab1:
+        os_id = st.number_input("ID da OS", min_value=1, step=1)
+        eventos = linha_do_tempo(int(os_id))
+        if not eventos:
+            st.warning("Nenhum evento registrado para esta OS.")
+        else:
+            st.dataframe(pd.DataFrame([{
+                "Data/Hora": datetime.fromisoformat(evento["ts"]).strftime("%d/%m/%Y %H:%M"),
+                "Evento": evento["tipo"],
+                "Responsável": evento.get("responsavel", ""),
+                "Alterações": ", ".join(f"{campo}: {valor}" for campo, valor in campos_da_os(evento, os_id).items()
+                                        if campo in ("Status", "Tipo", "Executante1", "Executante2", "Observações")
+                                        and (valor or evento["tipo"] == "atualizacao"))
+                               or ("OS removida" if evento["tipo"] == "restauracao" else "")
+            } for evento in eventos]), use_container_width=True)
+
+            duracoes = tempo_por_status(eventos, os_id)
+            if duracoes:
+                st.subheader("Tempo em cada status")
+                st.dataframe(pd.DataFrame([{
+                    "Status": status,
+                    "Horas": round(duracao.total_seconds() / 3600, 1)
+                } for status, duracao in duracoes.items()]), use_container_width=True)
+
+    with tab2:
+        col1, col2 = st.columns(2)
+        with col1:
+            data = st.date_input("Data", format="DD/MM/YYYY")
+        with col2:
+            hora = st.time_input("Hora", value=datetime.strptime("23:59", "%H:%M").time())
+
+        estado = reconstruir_estado(datetime.combine(data, hora).isoformat())
+        if estado.empty:
+            st.warning("Nenhuma OS existia nesta data.")
+        else:
+            st.write(f"OS abertas na data: {len(estado[estado['Status'] != 'Concluído'])}")
+            st.dataframe(estado["Status"].value_counts(), use_container_width=True)
+            st.dataframe(estado, use_container_width=True)
+
+def qualidade_dados():
+    st.header("🧪 Qualidade dos Dados")
+    meta = ler_meta()
+
+    col1, col2 = st.columns(2)
+    col1.metric("Versão do schema", f"{meta.get('versao_schema', '-')} (atual: {SCHEMA_VERSAO})")
+    col2.metric("Última validação", meta.get("validado_em", "-"))
+
+    relatorio = meta.get("ultimo_relatorio")
+    if relatorio and os.path.exists(relatorio):
+        st.subheader(f"Último relatório: {os.path.basename(relatorio)}")
+        st.dataframe(pd.read_csv(relatorio, dtype=str, keep_default_na=False), use_container_width=True)
+    else:
+        st.success("Nenhuma linha rejeitada ou com aviso.")
+
+    st.markdown("---")
+    st.subheader("Importar CSV")
+    arquivo = st.file_uploader("Arquivo de OS (.csv)", type="csv")
+    if arquivo is not None and st.button("📥 Validar e Importar"):
+        fazer_backup()
+        caminho_temporario = os.path.join(BACKUP_DIR, f"importacao_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        with open(caminho_temporario, 'wb') as f:
+            f.write(arquivo.getvalue())
+        try:
+            df, resumo = importar_csv(caminho_temporario, {"importacao": arquivo.name})
+            st.success(f"Importação concluída: {resumo['validas']} de {resumo['lidas']} OS válidas, "
+                       f"{resumo['rejeitadas']} rejeitadas, {resumo['avisos']} avisos.")
+        except Exception as e:
+            st.error(f"Erro ao importar arquivo: {str(e)}")
+        finally:
+            os.remove(caminho_temporario)
+
 def gerenciar_backups():
     st.header("💾 Gerenciamento de Backups")
     backups = sorted(glob.glob(os.path.join(BACKUP_DIR, "ordens_servico_*.csv")), reverse=True)
@@ -721,7 +836,7 @@ def gerenciar_backups():
     if st.button("🔙 Restaurar Backup Selecionado"):
         backup_fullpath = os.path.join(BACKUP_DIR, backup_selecionado)
         try:
-            shutil.copy(backup_fullpath, LOCAL_FILENAME)
+            importar_csv(backup_fullpath, {"backup": backup_selecionado})
             st.success(f"Dados restaurados do backup: {backup_selecionado}")
             time.sleep(2)
             st.rerun()
@@ -751,11 +866,15 @@ def configurar_github():
                     g = Github(token)
                     g.get_repo(repo).get_contents(filepath)
                     
-                    config = {
+                    config = {}
+                    if os.path.exists(CONFIG_FILE):
+                        with open(CONFIG_FILE) as f:
+                            config = json.load(f)
+                    config.update({
                         'github_repo': repo,
                         'github_filepath': filepath,
                         'github_token': token
-                    }
+                    })
                     
                     with open(CONFIG_FILE, 'w') as f:
                         json.dump(config, f)
@@ -804,6 +923,7 @@ def main():
             "🏠 Página Inicial",
             "📝 Cadastrar OS",
             "📋 Listar OS",
+            "👷 Minha Fila",
             "🔍 Buscar OS",
             "📊 Dashboard",
             "🔐 Supervisão"
@@ -816,6 +936,8 @@ def main():
         cadastrar_os()
     elif opcao == "📋 Listar OS":
         listar_os()
+    elif opcao == "👷 Minha Fila":
+        minha_fila()
     elif opcao == "🔍 Buscar OS":
         buscar_os()
     elif opcao == "📊 Dashboard":
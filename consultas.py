@@ -0,0 +1,113 @@
+"""Camada de consultas com memoização dos filtros sobre as ordens de serviço.
+
+Cada versão dos dados vira um `Instantaneo`: o DataFrame, as máscaras por status e por tipo
+(pré-calculadas) e um cache LRU de resultados indexado pelos filtros. A `CamadaConsultas` troca
+o instantâneo inteiro numa única atribuição ao recarregar, então quem já pegou um instantâneo
+continua consultando uma versão coerente. Uma única camada pode ser compartilhada entre sessões
+(ver `obter_consultas` em app.py).
+
+Filtros são tuplas (coluna, operador, valor), com os operadores:
+    "igual"     coluna == valor
+    "contem"    texto da coluna contém valor (sem diferenciar maiúsculas)
+    "mes_ano"   data da coluna (dd/mm/aaaa) cai no (mês, ano) informado
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+CAPACIDADE_CACHE = 256
+COLUNAS_INDEXADAS = ("Status", "Tipo")
+
+
+class Instantaneo:
+    """Uma versão dos dados com suas máscaras; o DataFrame e as máscaras não mudam depois de criados"""
+
+    def __init__(self, df, versao, capacidade=CAPACIDADE_CACHE):
+        self.df = df
+        self.versao = versao
+        self.capacidade = capacidade
+        self._bitmaps = {
+            (coluna, valor): df[coluna].to_numpy() == valor
+            for coluna in COLUNAS_INDEXADAS if coluna in df.columns
+            for valor in df[coluna].unique()
+        }
+        # Memos derivados apenas deste df; preenchidos sob demanda
+        self._datas = {}
+        self._cache = OrderedDict()
+        self._trava = threading.Lock()
+
+    def _lembrar(self, chave, calcular):
+        with self._trava:
+            if chave in self._cache:
+                self._cache.move_to_end(chave)
+                return self._cache[chave]
+        valor = calcular()
+        with self._trava:
+            self._cache[chave] = valor
+            while len(self._cache) > self.capacidade:
+                self._cache.popitem(last=False)
+        return valor
+
+    def _data(self, coluna):
+        if coluna not in self._datas:
+            datas = pd.to_datetime(self.df[coluna], format="%d/%m/%Y", errors='coerce')
+            datas = datas.fillna(pd.to_datetime(self.df[coluna], format="%d/%m/%y", errors='coerce'))
+            self._datas[coluna] = (datas.dt.month.to_numpy(), datas.dt.year.to_numpy())
+        return self._datas[coluna]
+
+    def mascara(self, filtro):
+        """Máscara booleana de um único filtro"""
+        coluna, operador, valor = filtro
+        if operador == "igual" and (coluna, valor) in self._bitmaps:
+            return self._bitmaps[(coluna, valor)]
+        if operador == "igual" and coluna in COLUNAS_INDEXADAS:
+            return np.zeros(len(self.df), dtype=bool)
+
+        def calcular():
+            if operador == "igual":
+                return self.df[coluna].to_numpy() == valor
+            if operador == "contem":
+                return self.df[coluna].astype(str).str.contains(valor, case=False, regex=False, na=False).to_numpy()
+            if operador == "mes_ano":
+                meses, anos = self._data(coluna)
+                return (meses == valor[0]) & (anos == valor[1])
+            raise ValueError(f"Operador de filtro desconhecido: {operador}")
+
+        return self._lembrar(("mascara", filtro), calcular)
+
+    def consultar(self, filtros=()):
+        """DataFrame com as OS que atendem a todos os filtros (não deve ser alterado pelo chamador)"""
+        filtros = tuple(filtros)
+        if not filtros:
+            return self.df
+
+        def calcular():
+            selecao = np.ones(len(self.df), dtype=bool)
+            for filtro in filtros:
+                selecao &= self.mascara(filtro)
+            return self.df[selecao]
+
+        return self._lembrar(("resultado", filtros), calcular)
+
+
+class CamadaConsultas:
+    """Guarda o instantâneo da versão atual dos dados e o substitui quando o CSV muda"""
+
+    def __init__(self, capacidade=CAPACIDADE_CACHE):
+        self.capacidade = capacidade
+        self.atual = Instantaneo(pd.DataFrame(), None, capacidade)
+        self._trava = threading.Lock()
+
+    def sincronizar(self, obter_versao, carregar):
+        """Retorna o instantâneo atual, recarregando (com `carregar`) somente quando `obter_versao()` mudar"""
+        atual = self.atual
+        if obter_versao() == atual.versao:
+            return atual
+        with self._trava:
+            versao = obter_versao()
+            if versao != self.atual.versao:
+                # A versão é lida antes da carga: se o arquivo mudar no meio, a próxima chamada recarrega
+                self.atual = Instantaneo(carregar(), versao, self.capacidade)
+            return self.atual
@@ -0,0 +1,891 @@
+"""Camada de dados das ordens de serviço: CSV, backups, índices e log de eventos.
+
+Usada pela interface Streamlit (app.py) e pela API HTTP (api.py); não depende do Streamlit.
+"""
+import glob
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import threading
+import time
+import unicodedata
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Constantes
+LOCAL_FILENAME = "ordens_servico.csv"
+BACKUP_DIR = "backups"
+MAX_BACKUPS = 10
+CONFIG_FILE = "config.json"
+LOCK_FILE = "ordens_servico.lock"
+EXECUTANTES_FILE = "executantes.txt"
+INDICE_EXECUTANTES_FILE = "indice_executantes.json"
+ASSINATURAS_FILE = "assinaturas_os.json"
+EVENTOS_FILE = "eventos_os.jsonl"
+INDICE_EVENTOS_FILE = "indice_eventos.json"
+SNAPSHOT_DIR = "snapshots"
+# Versão do formato do índice de eventos; índices de outra versão são reconstruídos
+INDICE_EVENTOS_VERSAO = 2
+INTERVALO_SNAPSHOT = 500
+META_FILE = "ordens_servico.meta.json"
+QUARENTENA_DIR = "quarentena"
+TENTATIVAS_LEITURA = 3
+
+# Versão do schema do CSV; incrementar ao mudar colunas e registrar a migração em MIGRACOES
+SCHEMA_VERSAO = 2
+
+COLUNAS_OS = ["ID", "Descrição", "Data", "Hora Abertura", "Solicitante", "Local",
+              "Tipo", "Status", "Data Conclusão", "Hora Conclusão", "Executante1", "Executante2", "Urgente", "Observações"]
+TIPOS_COLUNAS = {coluna: ("int64" if coluna == "ID" else str) for coluna in COLUNAS_OS}
+
+# Detecção de OS duplicadas (MinHash sobre trigramas de caracteres)
+NUM_PERMUTACOES = 64
+NUM_BANDAS = 16
+LIMIAR_DUPLICIDADE = 0.5
+_PRIMO_MINHASH = (1 << 31) - 1
+_rng_minhash = random.Random(2024)
+COEFICIENTES_A = np.array([_rng_minhash.randrange(1, _PRIMO_MINHASH) for _ in range(NUM_PERMUTACOES)], dtype=np.int64)
+COEFICIENTES_B = np.array([_rng_minhash.randrange(0, _PRIMO_MINHASH) for _ in range(NUM_PERMUTACOES)], dtype=np.int64)
+
+# Executantes pré-definidos (usados quando executantes.txt está vazio)
+EXECUTANTES_PREDEFINIDOS = ["Guilherme", "Ismael"]
+
+TIPOS_MANUTENCAO = {
+    1: "Elétrica",
+    2: "Mecânica",
+    3: "Refrigeração",
+    4: "Hidráulica",
+    5: "Civil",
+    6: "Instalação"
+}
+
+STATUS_OPCOES = {
+    1: "Pendente",
+    2: "Pausado",
+    3: "Em execução",
+    4: "Concluído"
+}
+
+def ler_config():
+    """Lê o config.json (ou retorna um dicionário vazio)"""
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE) as f:
+            return json.load(f)
+    return {}
+
+def agora_local():
+    """Data e hora atuais no fuso do sistema (UTC-3)"""
+    return datetime.utcnow() - timedelta(hours=3)
+
+_trava_processo = threading.RLock()
+_nivel_trava = 0
+
+@contextmanager
+def bloqueio_escrita():
+    """Serializa as escritas entre threads e processos (interface e API) usando um arquivo de trava.
+
+    É reentrante: uma operação que já tem a trava pode chamar outras que também a pedem.
+    """
+    global _nivel_trava
+    with _trava_processo:
+        _nivel_trava += 1
+        try:
+            if _nivel_trava > 1 or fcntl is None:
+                yield
+                return
+            with open(LOCK_FILE, 'w') as trava:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(trava, fcntl.LOCK_UN)
+        finally:
+            _nivel_trava -= 1
+
+def arquivo_temporario(caminho):
+    """Nome de arquivo temporário ao lado de `caminho`, único por processo e thread"""
+    return f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+def gravar_json_atomico(caminho, dados, **opcoes):
+    """Grava o JSON em um arquivo temporário e o coloca no lugar de uma vez (leitores nunca veem meio arquivo)"""
+    temporario = arquivo_temporario(caminho)
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, **opcoes)
+    os.replace(temporario, caminho)
+
+def converter_arquivo_antigo(df):
+    """Converte o formato antigo (com 'Executante') para o novo (com 'Executante1' e 'Executante2')"""
+    if 'Executante' in df.columns and 'Executante1' not in df.columns:
+        df['Executante1'] = df['Executante']
+        df['Executante2'] = ""
+        df['Observações'] = ""  # Adiciona coluna de observações se não existir
+        df.drop('Executante', axis=1, inplace=True)
+    if 'Observações' not in df.columns:  # Garante que a coluna existe
+        df['Observações'] = ""
+    return df
+
+def fazer_backup():
+    """Cria um backup dos dados atuais"""
+    if os.path.exists(LOCAL_FILENAME) and os.path.getsize(LOCAL_FILENAME) > 0:
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_name = os.path.join(BACKUP_DIR, f"ordens_servico_{timestamp}.csv")
+        shutil.copy(LOCAL_FILENAME, backup_name)
+        limpar_backups_antigos(MAX_BACKUPS)
+        return backup_name
+    return None
+
+def limpar_backups_antigos(max_backups):
+    """Remove backups antigos mantendo apenas os mais recentes"""
+    backups = sorted(glob.glob(os.path.join(BACKUP_DIR, "ordens_servico_*.csv")))
+    while len(backups) > max_backups:
+        try:
+            os.remove(backups[0])
+            backups.pop(0)
+        except:
+            continue
+
+def carregar_ultimo_backup():
+    """Retorna o caminho do backup mais recente"""
+    backups = sorted(glob.glob(os.path.join(BACKUP_DIR, "ordens_servico_*.csv")))
+    if backups:
+        return backups[-1]
+    return None
+
+def versao_dados():
+    """Identifica a versão atual do CSV (muda a cada gravação)"""
+    try:
+        info = os.stat(LOCAL_FILENAME)
+        return f"{info.st_mtime_ns:x}-{info.st_size:x}"
+    except FileNotFoundError:
+        return "0"
+
+def detectar_versao_schema(df):
+    """Identifica a versão do schema de um CSV bruto (1 = coluna única 'Executante')"""
+    if 'Executante' in df.columns and 'Executante1' not in df.columns:
+        return 1
+    return 2
+
+# Migrações de schema: versão de origem -> função que converte para a versão seguinte
+MIGRACOES = {
+    1: converter_arquivo_antigo
+}
+
+def migrar_schema(df):
+    """Aplica as migrações pendentes até a versão atual do schema"""
+    versao = detectar_versao_schema(df)
+    while versao < SCHEMA_VERSAO:
+        df = MIGRACOES[versao](df)
+        versao += 1
+    return df
+
+def reparar_colunas(df):
+    """Completa as colunas que faltam, ordena as colunas e troca valores nulos por texto vazio"""
+    for coluna in COLUNAS_OS:
+        if coluna not in df.columns:
+            df[coluna] = ""
+    extras = [coluna for coluna in df.columns if coluna not in COLUNAS_OS]
+    df = df[COLUNAS_OS + extras].fillna("").astype(str)
+    return df.replace({"nan": "", "NaN": ""})
+
+def datas_invalidas(datas, permitir_vazio=False):
+    """Máscara das datas que não estão em dd/mm/aaaa nem dd/mm/aa"""
+    convertidas = pd.to_datetime(datas, format="%d/%m/%Y", errors="coerce")
+    convertidas = convertidas.fillna(pd.to_datetime(datas, format="%d/%m/%y", errors="coerce"))
+    invalidas = convertidas.isna()
+    if permitir_vazio:
+        invalidas &= datas != ""
+    return invalidas
+
+def validar_linhas(df):
+    """Separa as OS válidas das rejeitadas e lista avisos de linhas mantidas.
+
+    Problemas estruturais (ID, Status, Tipo, Urgente) rejeitam a linha; datas fora do
+    formato são mantidas como estão e apenas registradas como aviso.
+    """
+    motivos = pd.Series("", index=df.index)
+    avisos = pd.Series("", index=df.index)
+
+    def marcar(destino, mascara, motivo):
+        destino[mascara] = destino[mascara] + motivo + "; "
+
+    ids = pd.to_numeric(df["ID"], errors="coerce")
+    marcar(motivos, ids.isna() | (ids <= 0) | (ids % 1 != 0), "ID inválido")
+    marcar(motivos, ids.notna() & ids.duplicated(keep="first"), "ID duplicado")
+    marcar(motivos, ~df["Status"].isin(STATUS_OPCOES.values()), "Status inválido")
+    marcar(motivos, ~df["Tipo"].isin(["", *TIPOS_MANUTENCAO.values()]), "Tipo inválido")
+    marcar(motivos, ~df["Urgente"].isin(["", "Sim", "Não"]), "Urgente inválido")
+    marcar(avisos, datas_invalidas(df["Data"]), "Data de abertura fora do formato")
+    marcar(avisos, datas_invalidas(df["Data Conclusão"], permitir_vazio=True), "Data de conclusão fora do formato")
+
+    rejeitar = motivos != ""
+    validas = df[~rejeitar].copy()
+    validas["ID"] = ids[~rejeitar].astype(int)
+    relatorio = pd.concat([
+        df[rejeitar].assign(Situação="Rejeitada", Motivo=motivos[rejeitar].str.rstrip("; ")),
+        df[~rejeitar & (avisos != "")].assign(Situação="Aviso", Motivo=avisos[~rejeitar & (avisos != "")].str.rstrip("; "))
+    ])
+    return validas.reset_index(drop=True), relatorio
+
+def salvar_relatorio_quarentena(relatorio, origem):
+    """Grava o relatório de linhas rejeitadas/avisos e retorna o caminho (ou None se não houver nada)"""
+    if relatorio.empty:
+        return None
+    os.makedirs(QUARENTENA_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    caminho = os.path.join(QUARENTENA_DIR, f"relatorio_{timestamp}.csv")
+    relatorio.assign(Origem=os.path.basename(origem)).to_csv(caminho, index=False, encoding='utf-8')
+    return caminho
+
+def isolar_arquivo(caminho):
+    """Copia um arquivo que não pôde ser lido para a quarentena, preservando-o para análise"""
+    os.makedirs(QUARENTENA_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    destino = os.path.join(QUARENTENA_DIR, f"corrompido_{timestamp}_{os.path.basename(caminho)}")
+    shutil.copy(caminho, destino)
+    return destino
+
+def preparar_dados(df):
+    """Pipeline de ingestão: migração de schema, reparo de colunas e validação das linhas"""
+    return validar_linhas(reparar_colunas(migrar_schema(df)))
+
+def ler_meta():
+    try:
+        with open(META_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def dados_validados():
+    """Indica se o CSV atual já passou pelo pipeline de ingestão nesta versão do schema"""
+    meta = ler_meta()
+    return meta.get("versao_schema") == SCHEMA_VERSAO and meta.get("versao_dados") == versao_dados()
+
+def _escrever_csv_validado(df, relatorio):
+    """Grava o CSV já validado, o arquivo de metadados e os índices (chamar com a trava)"""
+    temporario = arquivo_temporario(LOCAL_FILENAME)
+    df.to_csv(temporario, index=False, encoding='utf-8')
+    os.replace(temporario, LOCAL_FILENAME)
+    caminho_relatorio = salvar_relatorio_quarentena(relatorio, LOCAL_FILENAME)
+    gravar_json_atomico(META_FILE, {
+        "versao_schema": SCHEMA_VERSAO,
+        "versao_dados": versao_dados(),
+        "validado_em": datetime.now().isoformat(timespec="seconds"),
+        "ultimo_relatorio": caminho_relatorio or ler_meta().get("ultimo_relatorio")
+    })
+    salvar_indice_executantes(df)
+    sincronizar_assinaturas(df)
+    if relatorio is not None and (relatorio["Situação"] == "Rejeitada").any():
+        logger.warning("%d linhas rejeitadas; relatório em %s",
+                       int((relatorio["Situação"] == "Rejeitada").sum()), caminho_relatorio)
+    return caminho_relatorio
+
+def importar_csv(origem=LOCAL_FILENAME, restauracao=None):
+    """Valida e repara um CSV (o atual, um backup ou uma exportação) e o grava como arquivo de OS.
+
+    Com `restauracao` (ex.: {"backup": nome}), registra no log de eventos, junto com a gravação,
+    que o estado das OS foi substituído. Retorna o DataFrame válido e o resumo da importação.
+    """
+    with bloqueio_escrita():
+        for _ in range(TENTATIVAS_LEITURA):
+            versao = versao_dados()
+            bruto = pd.read_csv(origem, dtype=str, keep_default_na=False)
+            # Só quem escreve fora do sistema (sem a trava) muda o arquivo aqui; leitura parcial nunca é regravada
+            if origem != LOCAL_FILENAME or versao_dados() == versao:
+                break
+            time.sleep(0.2)
+        else:
+            raise RuntimeError(f"{LOCAL_FILENAME} foi alterado durante a leitura; tente novamente")
+        validas, relatorio = preparar_dados(bruto)
+        caminho_relatorio = _escrever_csv_validado(validas, relatorio)
+        if restauracao is not None:
+            registrar_eventos([evento_restauracao(validas, restauracao)])
+    return validas, {
+        "lidas": len(bruto),
+        "validas": len(validas),
+        "rejeitadas": int((relatorio["Situação"] == "Rejeitada").sum()),
+        "avisos": int((relatorio["Situação"] == "Aviso").sum()),
+        "relatorio": caminho_relatorio
+    }
+
+def ler_csv(caminho=LOCAL_FILENAME):
+    """Lê o CSV de OS; erros são propagados.
+
+    Se o arquivo já foi validado nesta versão do schema, a leitura é direta, sem reparos.
+    Caso contrário (arquivo antigo, restaurado ou alterado fora do sistema), passa uma vez
+    pelo pipeline de ingestão e é regravado. Outros caminhos (ex.: backups) são apenas validados.
+    """
+    if caminho == LOCAL_FILENAME:
+        if dados_validados():
+            return pd.read_csv(caminho, dtype=TIPOS_COLUNAS, keep_default_na=False)
+        with bloqueio_escrita():
+            # Outro processo pode ter terminado uma gravação (já validada) enquanto esperávamos a trava
+            if dados_validados():
+                return pd.read_csv(caminho, dtype=TIPOS_COLUNAS, keep_default_na=False)
+            return importar_csv(caminho)[0]
+    return preparar_dados(pd.read_csv(caminho, dtype=str, keep_default_na=False))[0]
+
+def gravar_csv(df, eventos=()):
+    """Valida e grava o DataFrame no CSV local, registra os eventos da alteração, atualiza os índices
+    e faz backup; erros são propagados"""
+    validas, relatorio = preparar_dados(df.copy())
+    relatorio = relatorio[relatorio["Situação"] == "Rejeitada"]
+    with bloqueio_escrita():
+        _escrever_csv_validado(validas, relatorio)
+        if eventos:
+            registrar_eventos(eventos)
+        fazer_backup()
+    return validas
+
+def adicionar_os(df, descricao, solicitante, local, urgente):
+    """Acrescenta uma nova OS ao DataFrame e retorna o DataFrame e o registro criado"""
+    novo_id = int(df["ID"].max()) + 1 if not df.empty and not pd.isna(df["ID"].max()) else 1
+    data_hora_local = agora_local()
+
+    registro = {
+        "ID": novo_id,
+        "Descrição": descricao,
+        "Data": data_hora_local.strftime("%d/%m/%Y"),
+        "Hora Abertura": data_hora_local.strftime("%H:%M"),
+        "Solicitante": solicitante,
+        "Local": local,
+        "Tipo": "",
+        "Status": "Pendente",
+        "Data Conclusão": "",
+        "Hora Conclusão": "",
+        "Executante1": "",
+        "Executante2": "",
+        "Urgente": "Sim" if urgente else "Não",
+        "Observações": ""
+    }
+    return pd.concat([df, pd.DataFrame([registro])], ignore_index=True), registro
+
+def aplicar_alteracoes(df, os_id, campos):
+    """Altera os campos de uma OS e retorna o DataFrame e as alterações efetivas.
+
+    Ao concluir, preenche data e hora de conclusão (se não informadas); em outros status, limpa esses campos.
+    """
+    filtro = df["ID"] == os_id
+    anterior = linha_para_dict(df[filtro].iloc[0])
+    campos = dict(campos)
+
+    if campos.get("Status", anterior["Status"]) == "Concluído":
+        if anterior["Status"] != "Concluído":
+            data_hora_local = agora_local()
+            campos.setdefault("Data Conclusão", data_hora_local.strftime("%d/%m/%Y"))
+            campos.setdefault("Hora Conclusão", data_hora_local.strftime("%H:%M"))
+    else:
+        campos["Data Conclusão"] = ""
+        campos["Hora Conclusão"] = ""
+
+    for coluna, valor in campos.items():
+        df.loc[filtro, coluna] = valor
+
+    atual = linha_para_dict(df[filtro].iloc[0])
+    return df, {coluna: valor for coluna, valor in atual.items() if anterior[coluna] != valor}
+
+def criar_os_persistida(descricao, solicitante, local, urgente):
+    """Cria uma OS lendo, alterando e gravando o CSV sob a mesma trava, para que dois processos
+    nunca gerem o mesmo ID nem sobrescrevam a gravação um do outro.
+
+    Retorna o DataFrame gravado e o registro criado.
+    """
+    with bloqueio_escrita():
+        df, registro = adicionar_os(ler_csv(), descricao, solicitante, local, urgente)
+        df = gravar_csv(df, [evento_criacao(registro, solicitante)])
+    return df, registro
+
+def alterar_os_persistida(os_id, campos, responsavel=""):
+    """Altera uma OS lendo, alterando e gravando o CSV sob a mesma trava.
+
+    Levanta KeyError se a OS não existir e ValueError se o status exigir executante principal.
+    Se nada mudar, não grava. Retorna o DataFrame atual e as alterações efetivas.
+    """
+    with bloqueio_escrita():
+        df = ler_csv()
+        filtro = df["ID"] == os_id
+        if not filtro.any():
+            raise KeyError(f"OS {os_id} não encontrada")
+        anterior = linha_para_dict(df[filtro].iloc[0])
+        status = campos.get("Status", anterior["Status"])
+        if status in ("Em execução", "Concluído") and not campos.get("Executante1", anterior["Executante1"]).strip():
+            raise ValueError("Informe o executante principal para este status")
+
+        df, alteracoes = aplicar_alteracoes(df, os_id, campos)
+        if alteracoes:
+            df = gravar_csv(df, [evento_atualizacao(os_id, alteracoes, responsavel)])
+    return df, alteracoes
+
+def evento_criacao(registro, responsavel):
+    return {"ts": agora_local().isoformat(timespec="seconds"), "tipo": "criacao", "id": registro["ID"],
+            "responsavel": responsavel, "campos": linha_para_dict(registro)}
+
+def evento_atualizacao(os_id, alteracoes, responsavel):
+    return {"ts": agora_local().isoformat(timespec="seconds"), "tipo": "atualizacao", "id": int(os_id),
+            "responsavel": responsavel, "campos": alteracoes}
+
+def evento_restauracao(df, origem, responsavel=""):
+    """Evento que substitui o estado inteiro (restauração de backup, importação ou download do GitHub)"""
+    return {"ts": agora_local().isoformat(timespec="seconds"), "tipo": "restauracao", "id": None,
+            "responsavel": responsavel, "campos": origem,
+            "estado": [linha_para_dict(linha) for linha in df.to_dict('records')]}
+
+def construir_indice_executantes(df):
+    """Monta o índice executante -> IDs das OS abertas e concluídas"""
+    indice = {}
+    for coluna in ["Executante1", "Executante2"]:
+        if coluna not in df.columns:
+            continue
+        atribuicoes = df[["ID", "Status", coluna]].copy()
+        atribuicoes[coluna] = atribuicoes[coluna].astype(str).str.strip()
+        atribuicoes = atribuicoes[~atribuicoes[coluna].isin(['', 'nan'])]
+        for (nome, concluida), grupo in atribuicoes.groupby([coluna, atribuicoes["Status"] == "Concluído"]):
+            entrada = indice.setdefault(nome, {"abertas": [], "concluidas": []})
+            chave = "concluidas" if concluida else "abertas"
+            entrada[chave].extend(int(os_id) for os_id in grupo["ID"])
+    for entrada in indice.values():
+        entrada["abertas"] = sorted(set(entrada["abertas"]))
+        entrada["concluidas"] = sorted(set(entrada["concluidas"]))
+    return indice
+
+def salvar_indice_executantes(df):
+    """Atualiza o índice de executantes em disco a partir do DataFrame salvo"""
+    try:
+        dados = {
+            "arquivo_mtime": os.path.getmtime(LOCAL_FILENAME),
+            "executantes": construir_indice_executantes(df)
+        }
+        gravar_json_atomico(INDICE_EXECUTANTES_FILE, dados, ensure_ascii=False)
+    except Exception as e:
+        logger.error("Erro ao atualizar índice de executantes: %s", e)
+
+def carregar_indice_executantes():
+    """Carrega o índice de executantes, reconstruindo se estiver desatualizado"""
+    try:
+        if os.path.exists(INDICE_EXECUTANTES_FILE) and os.path.exists(LOCAL_FILENAME):
+            with open(INDICE_EXECUTANTES_FILE, encoding='utf-8') as f:
+                dados = json.load(f)
+            if dados.get("arquivo_mtime") == os.path.getmtime(LOCAL_FILENAME):
+                return dados["executantes"]
+    except Exception:
+        pass
+    # Índice ausente ou o CSV foi alterado por fora (ex.: restauração de backup)
+    try:
+        df = ler_csv()
+    except Exception as e:
+        logger.error("Erro ao ler OS para o índice de executantes: %s", e)
+        return {}
+    salvar_indice_executantes(df)
+    return construir_indice_executantes(df)
+
+def carregar_executantes():
+    """Retorna o cadastro de executantes (executantes.txt ou, se vazio, os nomes do histórico)"""
+    nomes = []
+    if os.path.exists(EXECUTANTES_FILE):
+        with open(EXECUTANTES_FILE, encoding='utf-8') as f:
+            nomes = [linha.strip() for linha in f if linha.strip()]
+    if not nomes:
+        nomes = EXECUTANTES_PREDEFINIDOS + sorted(carregar_indice_executantes().keys())
+    return list(dict.fromkeys(nomes))
+
+def salvar_executantes(nomes):
+    """Grava o cadastro de executantes no executantes.txt"""
+    with open(EXECUTANTES_FILE, 'w', encoding='utf-8') as f:
+        f.write("\n".join(nomes) + ("\n" if nomes else ""))
+
+def sugerir_executantes(indice, executantes):
+    """Ordena os executantes pela quantidade de OS abertas (menor carga primeiro)"""
+    return sorted(executantes, key=lambda nome: len(indice.get(nome, {}).get("abertas", [])))
+
+def normalizar_texto(texto):
+    """Remove acentos, pontuação e espaços repetidos para comparação de textos"""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    texto = re.sub(r"[^a-z0-9]+", " ", texto)
+    return texto.strip()
+
+def calcular_assinatura(texto, n=3):
+    """Calcula a assinatura MinHash dos trigramas de caracteres do texto"""
+    texto = normalizar_texto(texto)
+    shingles = {texto[i:i + n] for i in range(max(len(texto) - n + 1, 1))}
+    hashes = np.array([zlib.crc32(shingle.encode()) % _PRIMO_MINHASH for shingle in shingles], dtype=np.int64)
+    return ((hashes[:, None] * COEFICIENTES_A + COEFICIENTES_B) % _PRIMO_MINHASH).min(axis=0).tolist()
+
+def similaridade_estimada(assinatura_a, assinatura_b):
+    """Estima a similaridade de Jaccard a partir de duas assinaturas MinHash"""
+    iguais = sum(1 for a, b in zip(assinatura_a, assinatura_b) if a == b)
+    return iguais / NUM_PERMUTACOES
+
+def sincronizar_assinaturas(df):
+    """Mantém o índice de assinaturas em disco alinhado com as OS do DataFrame"""
+    assinaturas = {}
+    try:
+        if os.path.exists(ASSINATURAS_FILE):
+            with open(ASSINATURAS_FILE, encoding='utf-8') as f:
+                assinaturas = json.load(f)
+    except Exception:
+        assinaturas = {}
+
+    alterado = False
+    ids_atuais = set()
+    for os_id, descricao, local in zip(df["ID"], df["Descrição"], df["Local"]):
+        if pd.isna(os_id):
+            continue
+        chave_id = str(int(os_id))
+        ids_atuais.add(chave_id)
+        local_normalizado = normalizar_texto(local)
+        conferencia = zlib.crc32(f"{local_normalizado}|{normalizar_texto(descricao)}".encode())
+        entrada = assinaturas.get(chave_id)
+        if entrada is None or entrada["conferencia"] != conferencia:
+            assinaturas[chave_id] = {
+                "conferencia": conferencia,
+                "local": local_normalizado,
+                "assinatura": calcular_assinatura(descricao)
+            }
+            alterado = True
+
+    for chave_id in set(assinaturas) - ids_atuais:
+        del assinaturas[chave_id]
+        alterado = True
+
+    if alterado:
+        try:
+            gravar_json_atomico(ASSINATURAS_FILE, assinaturas)
+        except Exception as e:
+            logger.error("Erro ao salvar índice de assinaturas: %s", e)
+    return assinaturas
+
+_assinaturas_por_local = (None, {})
+
+def carregar_assinaturas_por_local():
+    """Lê o índice de assinaturas (somente leitura) agrupado por local normalizado.
+
+    O agrupamento fica em memória e só é refeito quando o arquivo do índice muda;
+    manter o índice atualizado é responsabilidade de `gravar_csv`.
+    """
+    global _assinaturas_por_local
+    try:
+        info = os.stat(ASSINATURAS_FILE)
+    except FileNotFoundError:
+        return {}
+    versao = (info.st_mtime_ns, info.st_size)
+    if _assinaturas_por_local[0] != versao:
+        try:
+            with open(ASSINATURAS_FILE, encoding='utf-8') as f:
+                assinaturas = json.load(f)
+        except Exception as e:
+            logger.error("Erro ao ler índice de assinaturas: %s", e)
+            return {}
+        por_local = {}
+        for chave_id, entrada in assinaturas.items():
+            por_local.setdefault(entrada["local"], []).append((int(chave_id), entrada["assinatura"]))
+        _assinaturas_por_local = (versao, por_local)
+    return _assinaturas_por_local[1]
+
+def buscar_duplicatas(df, descricao, local):
+    """Retorna as OS abertas no mesmo local com descrição semelhante à informada"""
+    candidatos = carregar_assinaturas_por_local().get(normalizar_texto(local), [])
+    if not candidatos:
+        return []
+
+    abertas = df[df["ID"].isin([os_id for os_id, _ in candidatos]) & (df["Status"] != "Concluído")]
+    descricoes = dict(zip(abertas["ID"].astype(int), abertas["Descrição"]))
+    assinatura_nova = calcular_assinatura(descricao)
+    duplicatas = []
+    for os_id, assinatura in candidatos:
+        if os_id not in descricoes:
+            continue
+        similaridade = similaridade_estimada(assinatura_nova, assinatura)
+        if similaridade >= LIMIAR_DUPLICIDADE:
+            duplicatas.append({"ID": os_id, "Descrição": descricoes[os_id], "Similaridade": similaridade})
+    return sorted(duplicatas, key=lambda d: d["Similaridade"], reverse=True)
+
+def detectar_duplicatas_historicas():
+    """Varre todo o histórico em busca de pares de OS semelhantes no mesmo local (LSH por bandas).
+
+    O CSV é relido e o índice de assinaturas alinhado sob a trava, para que o índice compartilhado
+    nunca seja regravado a partir de uma cópia defasada das OS.
+    """
+    with bloqueio_escrita():
+        df = ler_csv()
+        assinaturas = sincronizar_assinaturas(df)
+    linhas_por_banda = NUM_PERMUTACOES // NUM_BANDAS
+
+    baldes = {}
+    for chave_id, entrada in assinaturas.items():
+        assinatura = entrada["assinatura"]
+        for banda in range(NUM_BANDAS):
+            inicio = banda * linhas_por_banda
+            chave = (entrada["local"], banda, tuple(assinatura[inicio:inicio + linhas_por_banda]))
+            baldes.setdefault(chave, []).append(chave_id)
+
+    candidatos = set()
+    for ids in baldes.values():
+        ids = sorted(ids, key=int)
+        for i in range(len(ids)):
+            for j in range(i + 1, len(ids)):
+                candidatos.add((ids[i], ids[j]))
+
+    descricoes = dict(zip(df["ID"].astype(int).astype(str), df["Descrição"]))
+    locais = dict(zip(df["ID"].astype(int).astype(str), df["Local"]))
+    pares = []
+    for id_a, id_b in candidatos:
+        similaridade = similaridade_estimada(assinaturas[id_a]["assinatura"], assinaturas[id_b]["assinatura"])
+        if similaridade >= LIMIAR_DUPLICIDADE:
+            pares.append({
+                "ID A": int(id_a),
+                "ID B": int(id_b),
+                "Local": locais.get(id_a, ""),
+                "Similaridade": round(similaridade, 2),
+                "Descrição A": descricoes.get(id_a, ""),
+                "Descrição B": descricoes.get(id_b, "")
+            })
+
+    colunas = ["ID A", "ID B", "Local", "Similaridade", "Descrição A", "Descrição B"]
+    return pd.DataFrame(pares, columns=colunas).sort_values(["Similaridade", "ID B"], ascending=[False, False])
+
+def converter_data_hora(data, hora=""):
+    """Converte data (dd/mm/aa ou dd/mm/aaaa) e hora do CSV para o formato ISO usado nos eventos"""
+    data = str(data).strip()
+    hora = str(hora).strip()
+    if not re.fullmatch(r"\d{1,2}:\d{2}", hora):
+        hora = "00:00"
+    for formato in ("%d/%m/%Y", "%d/%m/%y"):
+        try:
+            return datetime.strptime(f"{data} {hora}", f"{formato} %H:%M").isoformat()
+        except ValueError:
+            continue
+    return None
+
+def linha_para_dict(linha):
+    """Converte uma linha do DataFrame de OS em um dicionário serializável"""
+    registro = {}
+    for coluna in COLUNAS_OS:
+        valor = linha.get(coluna, "")
+        if pd.isna(valor) or str(valor) == "nan":
+            registro[coluna] = ""
+        elif coluna == "ID":
+            registro[coluna] = int(valor)
+        else:
+            registro[coluna] = str(valor)
+    return registro
+
+def aplicar_evento(estado, evento):
+    """Aplica um evento sobre o estado (dicionário ID -> OS)"""
+    if evento["tipo"] == "restauracao":
+        estado.clear()
+        estado.update({str(registro["ID"]): dict(registro) for registro in evento["estado"]})
+    elif evento["tipo"] in ("criacao", "importacao"):
+        estado[str(evento["id"])] = dict(evento["campos"])
+    elif evento["tipo"] == "atualizacao":
+        estado.setdefault(str(evento["id"]), {"ID": evento["id"]}).update(evento["campos"])
+
+def ids_afetados(estado, evento):
+    """IDs (texto) das OS que o evento altera; uma restauração afeta todas as OS cujo registro ela muda,
+    inclusive as que deixam de existir. `estado` é o estado antes do evento (só usado na restauração)."""
+    if evento["tipo"] != "restauracao":
+        return [] if evento.get("id") is None else [str(evento["id"])]
+    restaurado = {str(registro["ID"]): registro for registro in evento["estado"]}
+    return sorted((chave for chave in set(estado) | set(restaurado) if estado.get(chave) != restaurado.get(chave)),
+                  key=int)
+
+def campos_da_os(evento, os_id):
+    """Campos de uma OS registrados no evento; na restauração, o registro da OS no estado restaurado
+    ({} se ela deixou de existir)"""
+    if evento["tipo"] == "restauracao":
+        return next((registro for registro in evento["estado"] if int(registro["ID"]) == int(os_id)), {})
+    return evento["campos"]
+
+def carregar_indice_eventos():
+    """Carrega o índice do log de eventos (offsets por OS e snapshots)"""
+    if os.path.exists(INDICE_EVENTOS_FILE):
+        try:
+            with open(INDICE_EVENTOS_FILE, encoding='utf-8') as f:
+                indice = json.load(f)
+            tamanho_log = os.path.getsize(EVENTOS_FILE) if os.path.exists(EVENTOS_FILE) else 0
+            if indice.get("versao") == INDICE_EVENTOS_VERSAO and indice.get("tamanho_log") == tamanho_log:
+                return indice
+        except Exception:
+            pass
+    return reconstruir_indice_eventos()
+
+def reconstruir_indice_eventos():
+    """Varre o log inteiro para recriar o índice (usado apenas se o índice se perder)"""
+    # Com a trava, nenhuma escrita fica pela metade durante a varredura
+    with bloqueio_escrita():
+        indice = {"versao": INDICE_EVENTOS_VERSAO, "seq": 0, "tamanho_log": 0, "ordens": {}, "snapshots": []}
+        estado = {}
+        if os.path.exists(EVENTOS_FILE):
+            with open(EVENTOS_FILE, 'rb') as f:
+                offset = f.tell()
+                for linha in iter(f.readline, b""):
+                    evento = json.loads(linha)
+                    indice["seq"] = evento["seq"]
+                    for chave in ids_afetados(estado, evento):
+                        indice["ordens"].setdefault(chave, []).append(offset)
+                    aplicar_evento(estado, evento)
+                    offset = f.tell()
+                indice["tamanho_log"] = offset
+        for caminho in sorted(glob.glob(os.path.join(SNAPSHOT_DIR, "estado_*.json"))):
+            with open(caminho, encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot["offset"] <= indice["tamanho_log"]:
+                indice["snapshots"].append({"seq": snapshot["seq"], "ts_max": snapshot["ts_max"],
+                                            "offset": snapshot["offset"], "arquivo": caminho})
+        salvar_indice_eventos(indice)
+    return indice
+
+def salvar_indice_eventos(indice):
+    gravar_json_atomico(INDICE_EVENTOS_FILE, indice)
+
+def registrar_eventos(eventos):
+    """Acrescenta eventos ao log (somente append), atualizando índice e snapshots.
+
+    Leitura do índice, numeração (seq), append e gravação do índice ocorrem todos sob a trava.
+    """
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with bloqueio_escrita():
+        indice = carregar_indice_eventos()
+        ultimo_snapshot = indice["snapshots"][-1]["seq"] if indice["snapshots"] else 0
+        estado, ts_max = None, ""
+        gera_snapshot = indice["seq"] + len(eventos) - ultimo_snapshot >= INTERVALO_SNAPSHOT
+        if gera_snapshot or any(evento["tipo"] == "restauracao" for evento in eventos):
+            # Parte do estado atual e aplica os eventos em memória: o snapshot precisa dele, e a
+            # restauração é indexada sob cada OS que ela altera
+            estado, ts_max = reconstruir_estado_dict()
+
+        with open(EVENTOS_FILE, 'ab') as f:
+            for evento in eventos:
+                indice["seq"] += 1
+                evento = {"seq": indice["seq"], **evento}
+                offset = f.tell()
+                f.write((json.dumps(evento, ensure_ascii=False) + "\n").encode('utf-8'))
+                for chave in ids_afetados(estado, evento):
+                    indice["ordens"].setdefault(chave, []).append(offset)
+
+                if estado is not None:
+                    aplicar_evento(estado, evento)
+                    ts_max = max(ts_max, evento["ts"])
+                    if indice["seq"] - ultimo_snapshot >= INTERVALO_SNAPSHOT:
+                        caminho = os.path.join(SNAPSHOT_DIR, f"estado_{indice['seq']:08d}.json")
+                        with open(caminho, 'w', encoding='utf-8') as snap:
+                            json.dump({"seq": indice["seq"], "ts_max": ts_max, "offset": f.tell(), "estado": estado},
+                                      snap, ensure_ascii=False)
+                        indice["snapshots"].append({"seq": indice["seq"], "ts_max": ts_max,
+                                                    "offset": f.tell(), "arquivo": caminho})
+                        ultimo_snapshot = indice["seq"]
+            indice["tamanho_log"] = f.tell()
+        salvar_indice_eventos(indice)
+
+def reconstruir_estado_dict(ate=None):
+    """Reconstrói o estado das OS a partir do snapshot mais próximo e dos eventos seguintes.
+
+    Com `ate` (data ISO), considera apenas eventos ocorridos até essa data.
+    Retorna o estado e a maior data de evento aplicada.
+    """
+    indice = carregar_indice_eventos()
+    estado, ts_max, offset = {}, "", 0
+    candidatos = [s for s in indice["snapshots"] if ate is None or s["ts_max"] <= ate]
+    if candidatos:
+        with open(candidatos[-1]["arquivo"], encoding='utf-8') as f:
+            snapshot = json.load(f)
+        estado, ts_max, offset = snapshot["estado"], snapshot["ts_max"], snapshot["offset"]
+
+    if os.path.exists(EVENTOS_FILE):
+        with open(EVENTOS_FILE, 'rb') as f:
+            f.seek(offset)
+            # Só até o fim registrado no índice: um append em andamento pode deixar uma linha incompleta
+            for linha in f.read(indice["tamanho_log"] - offset).splitlines():
+                evento = json.loads(linha)
+                if ate is None or evento["ts"] <= ate:
+                    aplicar_evento(estado, evento)
+                    ts_max = max(ts_max, evento["ts"])
+    return estado, ts_max
+
+def reconstruir_estado(ate=None):
+    """Retorna o DataFrame de OS como estava na data `ate` (ou o estado atual)"""
+    estado, _ = reconstruir_estado_dict(ate)
+    df = pd.DataFrame(list(estado.values()), columns=COLUNAS_OS)
+    return df.sort_values("ID").reset_index(drop=True) if not df.empty else df
+
+def linha_do_tempo(os_id):
+    """Lê apenas os eventos de uma OS, usando os offsets do índice"""
+    indice = carregar_indice_eventos()
+    eventos = []
+    if os.path.exists(EVENTOS_FILE):
+        with open(EVENTOS_FILE, 'rb') as f:
+            for offset in indice["ordens"].get(str(os_id), []):
+                f.seek(offset)
+                eventos.append(json.loads(f.readline()))
+    return eventos
+
+def tempo_por_status(eventos, os_id, fim=None):
+    """Calcula quanto tempo a OS permaneceu em cada status"""
+    fim = fim or agora_local()
+    duracoes = {}
+    status_atual, inicio = None, None
+    for evento in eventos:
+        campos = campos_da_os(evento, os_id)
+        if evento["tipo"] == "restauracao" and not campos:
+            novo_status = None  # a restauração removeu a OS
+        else:
+            novo_status = campos.get("Status")
+            if novo_status is None:
+                continue
+        if novo_status == status_atual:
+            continue
+        momento = datetime.fromisoformat(evento["ts"])
+        if status_atual is not None:
+            duracoes[status_atual] = duracoes.get(status_atual, timedelta()) + (momento - inicio)
+        status_atual, inicio = novo_status, momento
+    if status_atual is not None and status_atual != "Concluído":
+        duracoes[status_atual] = duracoes.get(status_atual, timedelta()) + (fim - inicio)
+    return duracoes
+
+def importar_historico_inicial(carregar=ler_csv):
+    """Importa o histórico do CSV para o log de eventos se o log ainda não existir (ou estiver vazio).
+
+    A verificação e a importação ocorrem sob a mesma trava, então sessões e processos que
+    iniciam juntos importam o histórico uma única vez. Retorna True se importou.
+    """
+    with bloqueio_escrita():
+        if os.path.exists(EVENTOS_FILE) and os.path.getsize(EVENTOS_FILE) > 0:
+            return False
+        if not os.path.exists(LOCAL_FILENAME):
+            return False
+        importar_historico_eventos(carregar())
+        return True
+
+def importar_historico_eventos(df):
+    """Gera os eventos iniciais a partir do CSV existente quando o log ainda não existe"""
+    eventos = []
+    for _, linha in df.iterrows():
+        registro = linha_para_dict(linha)
+        ts_abertura = converter_data_hora(registro["Data"], registro["Hora Abertura"]) or "1970-01-01T00:00:00"
+        ts_conclusao = converter_data_hora(registro["Data Conclusão"], registro["Hora Conclusão"])
+        if registro["Status"] == "Concluído" and ts_conclusao:
+            abertura = dict(registro, **{"Status": "Pendente", "Data Conclusão": "", "Hora Conclusão": ""})
+            eventos.append({"ts": ts_abertura, "tipo": "importacao", "id": registro["ID"],
+                            "responsavel": registro["Solicitante"], "campos": abertura})
+            eventos.append({"ts": max(ts_conclusao, ts_abertura), "tipo": "atualizacao", "id": registro["ID"],
+                            "responsavel": "", "campos": {"Status": "Concluído",
+                                                          "Data Conclusão": registro["Data Conclusão"],
+                                                          "Hora Conclusão": registro["Hora Conclusão"]}})
+        else:
+            eventos.append({"ts": ts_abertura, "tipo": "importacao", "id": registro["ID"],
+                            "responsavel": registro["Solicitante"], "campos": registro})
+    registrar_eventos(eventos)
@@ -0,0 +1,302 @@
+"""Envio assíncrono de notificações de OS urgentes.
+
+As notificações são enfileiradas por `DespachanteNotificacoes.notificar` (nunca bloqueia)
+e enviadas em lotes por uma thread em segundo plano para os destinos configurados
+(SMTP, webhook, arquivo ou fila em memória).
+
+Para testar localmente, sem servidores externos:
+    python notificacoes.py
+"""
+import json
+import logging
+import queue
+import smtplib
+import socketserver
+import threading
+import time
+import urllib.request
+from email.message import EmailMessage
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 20
+ESPERA_LOTE = 5.0
+INTERVALO_MINIMO = 10.0
+MAX_TENTATIVAS = 5
+ATRASO_INICIAL = 2.0
+TAMANHO_FILA = 1000
+
+
+class SinkArquivo:
+    """Grava cada notificação como uma linha JSON em um arquivo"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    def enviar(self, lote):
+        with open(self.caminho, 'a', encoding='utf-8') as f:
+            for notificacao in lote:
+                f.write(json.dumps(notificacao, ensure_ascii=False) + "\n")
+
+
+class SinkFila:
+    """Coloca cada lote em uma fila em memória (útil em testes)"""
+
+    def __init__(self, fila=None):
+        self.fila = fila if fila is not None else queue.Queue()
+
+    def enviar(self, lote):
+        self.fila.put(list(lote))
+
+
+class SinkSMTP:
+    """Envia um e-mail por lote de notificações"""
+
+    def __init__(self, host, porta, remetente, destinatarios, usuario=None, senha=None, usar_tls=False, timeout=10):
+        self.host = host
+        self.porta = porta
+        self.remetente = remetente
+        self.destinatarios = destinatarios
+        self.usuario = usuario
+        self.senha = senha
+        self.usar_tls = usar_tls
+        self.timeout = timeout
+
+    def enviar(self, lote):
+        mensagem = EmailMessage()
+        mensagem["Subject"] = lote[0]["titulo"] if len(lote) == 1 else f"{len(lote)} notificações de OS urgentes"
+        mensagem["From"] = self.remetente
+        mensagem["To"] = ", ".join(self.destinatarios)
+        mensagem.set_content("\n\n".join(f"{n['titulo']}\n{n['mensagem']}" for n in lote))
+
+        with smtplib.SMTP(self.host, self.porta, timeout=self.timeout) as servidor:
+            if self.usar_tls:
+                servidor.starttls()
+            if self.usuario:
+                servidor.login(self.usuario, self.senha)
+            servidor.send_message(mensagem)
+
+
+class SinkWebhook:
+    """Envia o lote como JSON via HTTP POST"""
+
+    def __init__(self, url, cabecalhos=None, timeout=10):
+        self.url = url
+        self.cabecalhos = cabecalhos or {}
+        self.timeout = timeout
+
+    def enviar(self, lote):
+        corpo = json.dumps({"notificacoes": lote}, ensure_ascii=False).encode('utf-8')
+        requisicao = urllib.request.Request(self.url, data=corpo, method="POST",
+                                            headers={"Content-Type": "application/json", **self.cabecalhos})
+        with urllib.request.urlopen(requisicao, timeout=self.timeout) as resposta:
+            if resposta.status >= 300:
+                raise RuntimeError(f"Webhook respondeu com status {resposta.status}")
+
+
+class DespachanteNotificacoes:
+    """Fila de notificações com envio em lote, limite de taxa e novas tentativas com backoff"""
+
+    def __init__(self, sinks, tamanho_lote=TAMANHO_LOTE, espera_lote=ESPERA_LOTE,
+                 intervalo_minimo=INTERVALO_MINIMO, max_tentativas=MAX_TENTATIVAS, atraso_inicial=ATRASO_INICIAL):
+        self.sinks = list(sinks)
+        self.tamanho_lote = tamanho_lote
+        self.espera_lote = espera_lote
+        self.intervalo_minimo = intervalo_minimo
+        self.max_tentativas = max_tentativas
+        self.atraso_inicial = atraso_inicial
+        self.fila = queue.Queue(maxsize=TAMANHO_FILA)
+        self._ultimo_envio = 0.0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, name="despachante-notificacoes", daemon=True)
+        if self.sinks:
+            self._thread.start()
+
+    def notificar(self, notificacao):
+        """Enfileira uma notificação sem bloquear; retorna False se ela for descartada"""
+        if not self.sinks:
+            return False
+        try:
+            self.fila.put_nowait(notificacao)
+            return True
+        except queue.Full:
+            logger.warning("Fila de notificações cheia, notificação descartada: %s", notificacao.get("titulo"))
+            return False
+
+    def parar(self, timeout=None):
+        """Envia o que ainda estiver na fila e encerra a thread"""
+        self._parar.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _coletar_lote(self):
+        try:
+            lote = [self.fila.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        limite = time.monotonic() + self.espera_lote
+        while len(lote) < self.tamanho_lote:
+            restante = limite - time.monotonic()
+            try:
+                if self._parar.is_set() or restante <= 0:
+                    # Encerrando ou prazo do lote esgotado: pega só o que já está na fila
+                    lote.append(self.fila.get_nowait())
+                else:
+                    lote.append(self.fila.get(timeout=min(restante, 0.5)))
+            except queue.Empty:
+                if self._parar.is_set() or restante <= 0:
+                    break
+        return lote
+
+    def _executar(self):
+        while not (self._parar.is_set() and self.fila.empty()):
+            lote = self._coletar_lote()
+            if not lote:
+                continue
+
+            espera = self._ultimo_envio + self.intervalo_minimo - time.monotonic()
+            if espera > 0 and not self._parar.is_set():
+                self._parar.wait(espera)
+            self._enviar_com_tentativas(lote)
+            self._ultimo_envio = time.monotonic()
+
+    def _enviar_com_tentativas(self, lote):
+        pendentes = list(self.sinks)
+        for tentativa in range(self.max_tentativas):
+            falhas = []
+            for sink in pendentes:
+                try:
+                    sink.enviar(lote)
+                except Exception as e:
+                    logger.warning("Falha ao enviar notificações via %s (tentativa %d): %s",
+                                   type(sink).__name__, tentativa + 1, e)
+                    falhas.append(sink)
+            if not falhas:
+                return
+            pendentes = falhas
+            if tentativa + 1 < self.max_tentativas:
+                time.sleep(self.atraso_inicial * 2 ** tentativa)
+        for sink in pendentes:
+            logger.error("Notificações não entregues via %s após %d tentativas",
+                         type(sink).__name__, self.max_tentativas)
+
+
+def notificacao_os(registro, titulo):
+    """Monta a notificação de uma OS a partir do registro (dicionário com as colunas do CSV)"""
+    return {
+        "titulo": f"{titulo}: ID {registro['ID']} - {registro['Descrição']}",
+        "mensagem": (f"Local: {registro['Local']}\nSolicitante: {registro['Solicitante']}\n"
+                     f"Status: {registro['Status']}\nAbertura: {registro['Data']} {registro['Hora Abertura']}"),
+        "id": registro["ID"],
+        "status": registro["Status"]
+    }
+
+
+def criar_despachante(config):
+    """Cria o despachante a partir da seção "notificacoes" do config.json"""
+    sinks = []
+    if config.get("smtp"):
+        smtp = config["smtp"]
+        sinks.append(SinkSMTP(smtp["host"], smtp.get("porta", 25), smtp["remetente"], smtp["destinatarios"],
+                              usuario=smtp.get("usuario"), senha=smtp.get("senha"),
+                              usar_tls=smtp.get("usar_tls", False)))
+    if config.get("webhook"):
+        sinks.append(SinkWebhook(config["webhook"]["url"], cabecalhos=config["webhook"].get("cabecalhos")))
+    if config.get("arquivo"):
+        sinks.append(SinkArquivo(config["arquivo"]["caminho"]))
+
+    return DespachanteNotificacoes(
+        sinks,
+        tamanho_lote=config.get("tamanho_lote", TAMANHO_LOTE),
+        espera_lote=config.get("espera_lote", ESPERA_LOTE),
+        intervalo_minimo=config.get("intervalo_minimo", INTERVALO_MINIMO),
+        max_tentativas=config.get("max_tentativas", MAX_TENTATIVAS),
+        atraso_inicial=config.get("atraso_inicial", ATRASO_INICIAL)
+    )
+
+
+def iniciar_smtp_local(porta=0):
+    """Sobe um servidor SMTP mínimo em localhost que guarda as mensagens recebidas"""
+    recebidas = []
+
+    class TratadorSMTP(socketserver.StreamRequestHandler):
+        def handle(self):
+            self.wfile.write(b"220 localhost SMTP de teste\r\n")
+            dados = None
+            for linha in iter(self.rfile.readline, b""):
+                if dados is not None:
+                    if linha in (b".\r\n", b".\n"):
+                        recebidas.append(b"".join(dados).decode('utf-8', errors='replace'))
+                        dados = None
+                        self.wfile.write(b"250 OK\r\n")
+                    else:
+                        dados.append(linha)
+                    continue
+                comando = linha.strip().upper()
+                if comando.startswith(b"DATA"):
+                    dados = []
+                    self.wfile.write(b"354 Envie a mensagem\r\n")
+                elif comando.startswith(b"QUIT"):
+                    self.wfile.write(b"221 Tchau\r\n")
+                    return
+                else:
+                    self.wfile.write(b"250 OK\r\n")
+
+    servidor = socketserver.ThreadingTCPServer(("127.0.0.1", porta), TratadorSMTP)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, recebidas
+
+
+def iniciar_webhook_local(porta=0, falhas_iniciais=0):
+    """Sobe um servidor HTTP em localhost que guarda os POSTs recebidos.
+
+    Com `falhas_iniciais`, responde 503 às primeiras requisições para exercitar as novas tentativas.
+    """
+    recebidas = []
+    contador = {"falhas": falhas_iniciais}
+
+    class TratadorWebhook(BaseHTTPRequestHandler):
+        def do_POST(self):
+            corpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if contador["falhas"] > 0:
+                contador["falhas"] -= 1
+                self.send_response(503)
+            else:
+                recebidas.append(json.loads(corpo))
+                self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    servidor = HTTPServer(("127.0.0.1", porta), TratadorWebhook)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, recebidas
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    servidor_smtp, emails = iniciar_smtp_local()
+    servidor_http, posts = iniciar_webhook_local(falhas_iniciais=1)
+    fila = SinkFila()
+
+    despachante = DespachanteNotificacoes(
+        [SinkSMTP("127.0.0.1", servidor_smtp.server_address[1], "os@localhost", ["manutencao@localhost"]),
+         SinkWebhook(f"http://127.0.0.1:{servidor_http.server_address[1]}/"),
+         fila],
+        espera_lote=0.5, intervalo_minimo=1.0, atraso_inicial=0.2
+    )
+
+    inicio = time.perf_counter()
+    for os_id in range(1, 6):
+        despachante.notificar({"titulo": f"OS urgente {os_id}", "mensagem": "Teste de notificação", "id": os_id})
+    print(f"5 notificações enfileiradas em {(time.perf_counter() - inicio) * 1000:.2f} ms")
+
+    despachante.parar(timeout=30)
+    print(f"E-mails recebidos: {len(emails)}")
+    print(f"Webhooks recebidos: {len(posts)} ({sum(len(p['notificacoes']) for p in posts)} notificações)")
+    print(f"Lotes na fila: {fila.fila.qsize()}")
+    servidor_smtp.shutdown()
+    servidor_http.shutdown()
@@ -0,0 +1,87 @@
+"""Teste de carga da API de OS (api.py).
+
+Abre várias conexões HTTP/1.1 persistentes e dispara requisições GET durante alguns segundos,
+reportando requisições por segundo, latências e códigos de status.
+
+Uso:
+    uvicorn api:app --port 8000 --log-level warning
+    python teste_carga_api.py --porta 8000 --conexoes 20 --duracao 10
+    python teste_carga_api.py --caminhos "/os?status=Pendente" /os/1 --etag
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+
+async def requisitar(leitor, escritor, host, caminho, etag=None):
+    linhas = [f"GET {caminho} HTTP/1.1", f"Host: {host}", "Connection: keep-alive"]
+    if etag:
+        linhas.append(f"If-None-Match: {etag}")
+    escritor.write(("\r\n".join(linhas) + "\r\n\r\n").encode('latin-1'))
+    await escritor.drain()
+
+    status = int((await leitor.readline()).split()[1])
+    cabecalhos = {}
+    while True:
+        linha = (await leitor.readline()).decode('latin-1').strip()
+        if not linha:
+            break
+        nome, _, valor = linha.partition(":")
+        cabecalhos[nome.lower()] = valor.strip()
+    await leitor.readexactly(int(cabecalhos.get("content-length", 0)))
+    return status, cabecalhos.get("etag")
+
+
+async def trabalhador(host, porta, caminhos, fim, usar_etag, latencias, status_vistos):
+    leitor, escritor = await asyncio.open_connection(host, porta)
+    etags = {}
+    indice = 0
+    try:
+        while time.perf_counter() < fim:
+            caminho = caminhos[indice % len(caminhos)]
+            indice += 1
+            inicio = time.perf_counter()
+            status, etag = await requisitar(leitor, escritor, host, caminho, etags.get(caminho) if usar_etag else None)
+            latencias.append(time.perf_counter() - inicio)
+            status_vistos[status] += 1
+            if etag:
+                etags[caminho] = etag
+    finally:
+        escritor.close()
+
+
+def percentil(valores, p):
+    return valores[min(len(valores) - 1, int(len(valores) * p))] if valores else 0.0
+
+
+async def executar(args):
+    latencias = []
+    status_vistos = Counter()
+    inicio = time.perf_counter()
+    fim = inicio + args.duracao
+    await asyncio.gather(*(trabalhador(args.host, args.porta, args.caminhos, fim, args.etag, latencias, status_vistos)
+                           for _ in range(args.conexoes)))
+    duracao = time.perf_counter() - inicio
+
+    latencias.sort()
+    print(f"Requisições: {len(latencias)} em {duracao:.1f}s ({len(latencias) / duracao:.0f} req/s)")
+    print(f"Latência p50: {percentil(latencias, 0.50) * 1000:.1f} ms | "
+          f"p95: {percentil(latencias, 0.95) * 1000:.1f} ms | p99: {percentil(latencias, 0.99) * 1000:.1f} ms")
+    print("Status: " + ", ".join(f"{status}: {quantidade}" for status, quantidade in sorted(status_vistos.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da API de OS")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--conexoes", type=int, default=20, help="Conexões simultâneas")
+    parser.add_argument("--duracao", type=float, default=10.0, help="Duração do teste em segundos")
+    parser.add_argument("--caminhos", nargs="+", default=["/os", "/os?status=Pendente", "/os/1"],
+                        help="Caminhos requisitados em rodízio")
+    parser.add_argument("--etag", action="store_true", help="Reenvia o ETag recebido em If-None-Match")
+    asyncio.run(executar(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()